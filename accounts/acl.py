@@ -0,0 +1,93 @@
+"""
+Effective bucket permissions.
+
+Each user's grants, direct and through groups, are folded into one index
+per organization: the set of buckets that have any grant, and the
+permission bits the user holds on each of them. The index is built with
+one query over the organization's grants and cached per process, so
+authorizing an object request is a dictionary lookup. Every grant or
+group membership change bumps Organization.acl_version, which is part of
+the cache key, both when it is made and when it commits. The version is a column of the organization row each
+request loads anyway, so a revocation invalidates the cached indexes of
+all its users in every process at once.
+
+Permissions: read lists and downloads objects, write uploads them and
+execute deletes them.
+"""
+
+from functools import partial
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+
+from .models import BucketGrant, Organization
+
+READ = 4
+WRITE = 2
+EXECUTE = 1
+ALL = READ | WRITE | EXECUTE
+
+INDEX_CACHE_KEY = "accounts:acl:{}:{}:{}"
+INDEX_CACHE_TIMEOUT = 300
+
+
+def grant_bits(can_read, can_write, can_execute):
+    return (READ if can_read else 0) | (WRITE if can_write else 0) | (
+        EXECUTE if can_execute else 0
+    )
+
+
+def bump_version(organization_id):
+    Organization.objects.filter(pk=organization_id).update(acl_version=F("acl_version") + 1)
+
+
+def invalidate(organization_id, using=DEFAULT_DB_ALIAS):
+    """
+    Bumps the organization's acl_version for a change made on `using`, and
+    again once that change commits: an index built in between still sees
+    the old grants and would otherwise stay cached under the new version.
+    """
+    if organization_id is None:
+        return
+    bump_version(organization_id)
+    transaction.on_commit(partial(bump_version, organization_id), using=using)
+
+
+def build_index(user, organization):
+    """
+    Returns (restricted bucket ids, {bucket id: permission bits}) for a
+    user in an organization.
+    """
+    group_ids = set(user.groups.values_list("id", flat=True))
+    restricted = set()
+    permissions = {}
+    grants = BucketGrant.objects.for_organization(organization).values_list(
+        "bucket_id", "user_id", "group_id", "can_read", "can_write", "can_execute"
+    )
+    for bucket_id, user_id, group_id, *flags in grants:
+        restricted.add(bucket_id)
+        if user_id == user.pk or group_id in group_ids:
+            permissions[bucket_id] = permissions.get(bucket_id, 0) | grant_bits(*flags)
+    return frozenset(restricted), permissions
+
+
+def get_index(user, organization):
+    key = INDEX_CACHE_KEY.format(organization.pk, user.pk, organization.acl_version)
+    index = cache.get(key)
+    if index is None:
+        index = build_index(user, organization)
+        cache.set(key, index, INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def effective_permissions(user, organization, bucket_id):
+    """
+    Permission bits a member of `organization` holds on one of its buckets.
+    """
+    if organization.manager_id == user.pk:
+        return ALL
+    restricted, permissions = get_index(user, organization)
+    if bucket_id not in restricted:
+        return ALL
+    return permissions.get(bucket_id, 0)
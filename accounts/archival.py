@@ -0,0 +1,133 @@
+import time
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from . import changefeed
+from .models import Bucket, BucketArchive, Object, Organization, User
+from .multipart import abort_bucket_uploads
+from .sharding import get_shards
+from .usage import release_archived
+
+
+def delete_organization(org, batch_size=500):
+    """
+    Starts offboarding an organization: marks it deleted and soft-deletes
+    its buckets in batches, each in its own short transaction. The rows are
+    archived and the organization removed later by purge_buckets.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        Organization.objects.filter(pk=org.pk).update(deleted_at=now)
+        changefeed.record(
+            Organization, org.pk, org.pk, "updated", DEFAULT_DB_ALIAS, {"deleted_at": now}
+        )
+
+    buckets = Bucket.objects.for_organization(org)
+    while True:
+        pks = list(buckets.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+        with transaction.atomic(using=buckets.db):
+            Bucket.all_objects.using(buckets.db).filter(pk__in=pks).update(deleted_at=now)
+            changefeed.record_bulk(
+                Bucket, pks, "updated", buckets.db, org.pk, {"deleted_at": now}
+            )
+
+
+def delete_bucket_contents(using, bucket_ids, batch_size=500):
+    """
+    Removes the object metadata of buckets in batches, so archiving a
+    bucket never has to cascade over all of its objects in one statement.
+    """
+    contents = Object.objects.using(using).filter(bucket_id__in=bucket_ids)
+    while True:
+        pks = list(contents.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+        Object.objects.using(using).filter(pk__in=pks).delete()
+
+
+def archive_deleted_buckets(using, batch_size=500, pause=0):
+    """
+    Moves soft-deleted buckets on one shard into BucketArchive, at most
+    batch_size rows per transaction, sleeping `pause` seconds between
+    batches so other writers are not starved. Their objects and open
+    uploads are dropped first. Returns the number archived.
+    """
+    archived = 0
+    pending = (
+        Bucket.all_objects.using(using)
+        .filter(deleted_at__isnull=False)
+        .order_by("pk")
+    )
+    while True:
+        pks = list(pending.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return archived
+        abort_bucket_uploads(using, pks)
+        delete_bucket_contents(using, pks, batch_size=batch_size)
+
+        with transaction.atomic(using=using):
+            batch = list(Bucket.all_objects.using(using).filter(pk__in=pks))
+
+            BucketArchive.objects.using(using).bulk_create(
+                [
+                    BucketArchive(
+                        id=bucket.pk,
+                        name=bucket.name,
+                        prefix=bucket.prefix,
+                        organization_id=bucket.organization_id,
+                        created_at=bucket.created_at,
+                        updated_at=bucket.updated_at,
+                        deleted_at=bucket.deleted_at,
+                    )
+                    for bucket in batch
+                ]
+            )
+            Bucket.all_objects.using(using).filter(pk__in=pks).delete()
+        release_archived(batch)
+
+        archived += len(batch)
+        if pause:
+            time.sleep(pause)
+
+
+def finish_deleted_organizations(batch_size=500):
+    """
+    Deletes organizations marked deleted once none of their buckets are
+    left, detaching their members in batches first. Returns the number of
+    organizations removed.
+    """
+    removed = 0
+    for org in Organization.objects.filter(deleted_at__isnull=False):
+        if Bucket.all_objects.for_organization(org).exists():
+            continue
+
+        with transaction.atomic():
+            Organization.objects.filter(pk=org.pk).update(manager=None)
+            changefeed.record(
+                Organization, org.pk, org.pk, "updated", DEFAULT_DB_ALIAS, {"manager_id": None}
+            )
+        members = User.objects.filter(organization=org)
+        while True:
+            pks = list(members.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            with transaction.atomic():
+                User.objects.filter(pk__in=pks).update(organization=None)
+                changefeed.record_bulk(
+                    User, pks, "updated", DEFAULT_DB_ALIAS, org.pk, {"organization_id": None}
+                )
+
+        org.delete()
+        removed += 1
+    return removed
+
+
+def purge(batch_size=500, pause=0):
+    archived = sum(
+        archive_deleted_buckets(using, batch_size=batch_size, pause=pause)
+        for using in get_shards()
+    )
+    return archived, finish_deleted_organizations(batch_size=batch_size)
@@ -0,0 +1,102 @@
+import atexit
+import functools
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .batch import after_commit
+from .models import AuditEvent
+
+
+class AuditWriter:
+    """
+    Buffers audit events in memory and bulk-inserts them every
+    AUDIT_LOG_BATCH_SIZE events or AUDIT_LOG_FLUSH_INTERVAL_MS milliseconds,
+    whichever comes first. Pending events are flushed on interpreter exit.
+    Events that fail to be written stay buffered and are retried by the
+    next flush.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._timer = None
+
+    def record(self, action, *, actor=None, organization=None, target=None, **data):
+        event = AuditEvent(
+            action=action,
+            actor_id=getattr(actor, "pk", None),
+            organization_id=getattr(organization, "pk", organization),
+            target_type=target._meta.model_name if target is not None else "",
+            target_id=target.pk if target is not None else None,
+            data=data,
+        )
+        event.month = event.created_at.year * 100 + event.created_at.month
+        # Buffered only if an enclosing atomic batch commits
+        after_commit(functools.partial(self._add, event))
+
+    def _add(self, event):
+        with self._lock:
+            self._buffer.append(event)
+            full = len(self._buffer) >= settings.AUDIT_LOG_BATCH_SIZE
+            if not full:
+                self._schedule()
+
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                # The recorded change has already been made; the events are
+                # buffered again and retried from the timer instead of
+                # failing the request that happened to fill the batch.
+                pass
+
+    def flush(self):
+        """
+        Writes the buffered events. If the insert fails they are put back
+        in front of anything recorded meanwhile and the error is raised.
+        """
+        with self._lock:
+            events, self._buffer = self._buffer, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not events:
+            return 0
+        try:
+            # A savepoint, so a failure leaves the caller's transaction usable
+            with transaction.atomic():
+                AuditEvent.objects.bulk_create(events)
+        except Exception:
+            with self._lock:
+                self._buffer[:0] = events
+                self._schedule()
+            raise
+        return len(events)
+
+    def _schedule(self):
+        # Called with the lock held
+        if self._timer is None:
+            self._timer = threading.Timer(
+                settings.AUDIT_LOG_FLUSH_INTERVAL_MS / 1000, self._flush_from_timer
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            # Rescheduled by flush(); nobody is waiting for this thread
+            pass
+        finally:
+            # The timer thread owns its own connections.
+            connections.close_all()
+
+
+audit_log = AuditWriter()
+atexit.register(audit_log.flush)
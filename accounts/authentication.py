@@ -0,0 +1,120 @@
+"""
+Organization-scoped API keys for machine clients.
+
+A key is "<prefix>.<secret>". Only the prefix, which is indexed, and a
+keyed SHA-256 HMAC of the whole key are stored, so verifying a key costs
+one HMAC instead of a password hash. Verified keys are remembered per
+process for ACCOUNTS_API_KEY_CACHE_TTL seconds, keyed by that HMAC, so
+repeated calls with the same key do not query the database; a revoked key
+stops working in other processes once their entry expires.
+
+JWT users are looked up as usual, but the last user loaded for each id is
+kept per process for ACCOUNTS_STALE_ORGANIZATION_SECONDS and used while
+the database circuit is open, so reads that can be served stale are not
+lost to authentication.
+"""
+
+import secrets
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import ApiKey
+from .overload import DatabaseUnavailable
+from .ttlcache import TTLCache
+
+KEYWORD = "Api-Key"
+
+verified_keys = TTLCache(ttl=settings.ACCOUNTS_API_KEY_CACHE_TTL)
+
+# user id -> last User loaded for a JWT, for use while the database is down
+jwt_users = TTLCache(ttl=settings.ACCOUNTS_STALE_ORGANIZATION_SECONDS)
+
+
+def hash_api_key(token):
+    return salted_hmac("accounts.ApiKey", token, algorithm="sha256").hexdigest()
+
+
+def create_api_key(organization, user, name):
+    """
+    Issues a key acting as `user` within `organization`. Returns the
+    ApiKey and the token, which is not stored and cannot be shown again.
+    """
+    # 64 random bits, so prefixes stay unique however many keys are issued
+    prefix = secrets.token_hex(8)
+    token = f"{prefix}.{secrets.token_urlsafe(32)}"
+    key = ApiKey.objects.create(
+        organization=organization,
+        user=user,
+        name=name,
+        prefix=prefix,
+        hashed_key=hash_api_key(token),
+    )
+    return key, token
+
+
+def revoke_api_key(key):
+    key.revoked_at = timezone.now()
+    key.save(update_fields=["revoked_at"])
+    verified_keys.delete(key.hashed_key)
+
+
+class ApiKeyAuthentication(BaseAuthentication):
+    """
+    Authenticates "Authorization: Api-Key <key>" as the key's user. The
+    key only works while that user is still a member of its organization.
+    """
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != KEYWORD.lower().encode():
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed("Invalid API key header.")
+
+        token = header[1].decode(errors="replace")
+        hashed = hash_api_key(token)
+        key = verified_keys.get(hashed)
+        if key is None:
+            key = self.verify(token, hashed)
+            verified_keys.set(hashed, key)
+        return key.user, key
+
+    def verify(self, token, hashed):
+        prefix = token.split(".", 1)[0]
+        key = (
+            ApiKey.objects.select_related("user")
+            .filter(prefix=prefix, revoked_at__isnull=True)
+            .first()
+        )
+        if key is None or not constant_time_compare(key.hashed_key, hashed):
+            raise AuthenticationFailed("Invalid API key.")
+        if not key.user.is_active or key.user.organization_id != key.organization_id:
+            raise AuthenticationFailed("API key user is no longer a member.")
+        return key
+
+    def authenticate_header(self, request):
+        return KEYWORD
+
+
+class CachedUserJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that falls back to the user it last loaded for the
+    token's user id when the database is unavailable.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user = super().get_user(validated_token)
+        except DatabaseUnavailable:
+            user = jwt_users.get(str(validated_token.get(jwt_settings.USER_ID_CLAIM)))
+            if user is None:
+                raise
+            return user
+        jwt_users.set(str(user.pk), user)
+        return user
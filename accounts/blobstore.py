@@ -0,0 +1,201 @@
+"""
+Content-addressed storage for object data.
+
+Blobs are named by the SHA-256 of their bytes, so the same content
+uploaded twice, to any bucket, is stored once. Objects point at their blob
+through Object.digest; blobs no object references any more are removed by
+the collect_blobs command. The backend is chosen by ACCOUNTS_BLOB_STORE.
+"""
+
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BlobStore(ABC):
+    @abstractmethod
+    def write(self, chunks):
+        """
+        Stores the concatenated byte strings of `chunks` and returns
+        (digest, size).
+        """
+
+    @abstractmethod
+    def open(self, digest):
+        """
+        Binary file object for a blob. Raises FileNotFoundError.
+        """
+
+    @abstractmethod
+    def delete(self, digest):
+        """
+        Removes a blob; deleting one that does not exist is not an error.
+        """
+
+    @abstractmethod
+    def list(self):
+        """
+        Yields (digest, modification timestamp) for every blob.
+        """
+
+    @abstractmethod
+    def write_part(self, upload_id, part_number, chunks):
+        """
+        Stages one part of a multipart upload, replacing an earlier copy
+        of the same part, and returns (etag, size).
+        """
+
+    @abstractmethod
+    def assemble(self, upload_id, part_numbers):
+        """
+        Stores the concatenation of the given parts as a blob and returns
+        (digest, size). The parts stay staged until discard_upload().
+        """
+
+    @abstractmethod
+    def discard_upload(self, upload_id):
+        """
+        Removes every staged part of an upload.
+        """
+
+
+def append_file(source, target):
+    """
+    Appends the file `source` to `target` with copy_file_range(2), which
+    copies inside the kernel (or shares extents on reflink filesystems),
+    falling back to a buffered copy where it is unavailable.
+    """
+    remaining = os.fstat(source.fileno()).st_size
+    try:
+        while remaining:
+            copied = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+            if not copied:
+                break
+            remaining -= copied
+    except (AttributeError, OSError):
+        shutil.copyfileobj(source, target)
+
+
+def hash_file(file):
+    size = os.fstat(file.fileno()).st_size
+    if not size:
+        return hashlib.sha256().hexdigest(), 0
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return hashlib.sha256(mapped).hexdigest(), size
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Blobs as files under `root`, fanned out as ab/cd/abcd.... An upload is
+    written chunk by chunk to a temporary file on the same filesystem and
+    renamed into place once hashed, so it is never held in memory and a
+    blob is never visible half-written. Multipart parts are staged under
+    uploads/<upload id>/.
+    """
+
+    def __init__(self, root):
+        self.root = os.fspath(root)
+        self.tmp = os.path.join(self.root, "tmp")
+        self.uploads = os.path.join(self.root, "uploads")
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def part_path(self, upload_id, part_number):
+        return os.path.join(self.uploads, str(upload_id), str(part_number))
+
+    def stream_to_temporary(self, chunks, directory):
+        """
+        Writes `chunks` to a new file in `directory` and returns (path,
+        SHA-256 hex digest, size).
+        """
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".")
+        try:
+            sha256 = hashlib.sha256()
+            size = 0
+            with open(fd, "wb", buffering=0) as file:
+                for chunk in chunks:
+                    sha256.update(chunk)
+                    file.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path, sha256.hexdigest(), size
+
+    def commit(self, tmp_path, digest):
+        try:
+            path = self.path(digest)
+            if os.path.exists(path):
+                # Already stored; touch it so collect_blobs' grace period
+                # covers the object about to reference it.
+                os.utime(path)
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def write(self, chunks):
+        tmp_path, digest, size = self.stream_to_temporary(chunks, self.tmp)
+        self.commit(tmp_path, digest)
+        return digest, size
+
+    def open(self, digest):
+        return open(self.path(digest), "rb")
+
+    def delete(self, digest):
+        try:
+            os.unlink(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        for directory, subdirectories, files in os.walk(self.root):
+            if directory == self.root:
+                subdirectories[:] = [
+                    name for name in subdirectories if name not in ("tmp", "uploads")
+                ]
+                continue
+            for name in files:
+                yield name, os.stat(os.path.join(directory, name)).st_mtime
+
+    def write_part(self, upload_id, part_number, chunks):
+        path = self.part_path(upload_id, part_number)
+        tmp_path, etag, size = self.stream_to_temporary(chunks, os.path.dirname(path))
+        os.replace(tmp_path, path)
+        return etag, size
+
+    def assemble(self, upload_id, part_numbers):
+        os.makedirs(self.tmp, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp)
+        try:
+            with open(fd, "wb+", buffering=0) as target:
+                for part_number in part_numbers:
+                    part_path = self.part_path(upload_id, part_number)
+                    with open(part_path, "rb", buffering=0) as part:
+                        append_file(part, target)
+                digest, size = hash_file(target)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.commit(tmp_path, digest)
+        return digest, size
+
+    def discard_upload(self, upload_id):
+        shutil.rmtree(os.path.join(self.uploads, str(upload_id)), ignore_errors=True)
+
+
+def get_blob_store():
+    config = settings.ACCOUNTS_BLOB_STORE
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
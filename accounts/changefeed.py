@@ -0,0 +1,272 @@
+"""
+Change-data feed of organizations, users and buckets.
+
+Every save() and delete() of those models writes a ChangeEvent in the
+same transaction (the outbox pattern), and the bulk UPDATEs used by
+offboarding record theirs explicitly. Counters maintained with F()
+updates (storage usage, the ACL version) are not part of the feed.
+Events are stored on the database of the changed row, so each shard has
+its own sequence; consumers keep one `since` cursor per database.
+
+When move_organization moves buckets to another shard, the source feed
+records "moved" (with the target shard) instead of "deleted" for each of
+them and the target feed records "created" with the full row, so
+consumers reading the feeds in any order never drop a moved bucket.
+
+Readers in this process are woken as soon as a change commits. Changes
+committed by other processes are picked up by re-checking the database
+every ACCOUNTS_CHANGES_POLL_INTERVAL seconds. Under ASGI event streams
+are async generators, so each change is sent as soon as it is read.
+
+Sequence numbers are allocated when an event is inserted, not when its
+transaction commits, so a lower one can become visible after a higher one.
+Reads therefore stop before the first missing sequence number that a
+recent event follows, until it shows up or ACCOUNTS_CHANGES_GAP_SECONDS
+have passed (it was rolled back), and a `since` cursor never skips a
+change.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ChangeEvent, Organization
+
+# Never copied into the feed
+EXCLUDED_FIELDS = {"password"}
+
+# Upper bound for ?wait=, in seconds
+MAX_WAIT = 30
+
+
+class ChangeNotifier:
+    def __init__(self):
+        self._condition = threading.Condition()
+        # (event loop, asyncio.Event) of async readers
+        self._waiters = set()
+
+    def notify(self):
+        with self._condition:
+            self._condition.notify_all()
+            for loop, event in self._waiters:
+                loop.call_soon_threadsafe(event.set)
+
+    def wait(self, timeout):
+        with self._condition:
+            self._condition.wait(max(timeout, 0))
+
+    async def async_wait(self, timeout):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condition:
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._condition:
+                self._waiters.discard(waiter)
+
+
+notifier = ChangeNotifier()
+
+_moves = threading.local()
+
+
+@contextmanager
+def moving_to(shard):
+    """
+    Records the deletions made inside the block as moves to `shard`.
+    """
+    _moves.shard = shard
+    try:
+        yield
+    finally:
+        _moves.shard = None
+
+
+def deletion():
+    """
+    (operation, data) of the event for a row being deleted.
+    """
+    shard = getattr(_moves, "shard", None)
+    if shard is None:
+        return "deleted", None
+    return "moved", {"shard": shard}
+
+
+def organization_of(instance):
+    if isinstance(instance, Organization):
+        return instance.pk
+    return instance.organization_id
+
+
+def snapshot(instance, fields=None):
+    data = {}
+    for field in instance._meta.concrete_fields:
+        if field.name in EXCLUDED_FIELDS:
+            continue
+        if fields is not None and field.name not in fields and field.attname not in fields:
+            continue
+        data[field.attname] = field.value_from_object(instance)
+    return data
+
+
+def record(model, object_id, organization_id, operation, using, data=None):
+    record_bulk(model, [object_id], operation, using, organization_id, data)
+
+
+def record_bulk(model, object_ids, operation, using, organization_id=None, data=None):
+    """
+    Writes one event per object id. Call inside the transaction making
+    the change.
+    """
+    ChangeEvent.objects.using(using).bulk_create(
+        [
+            ChangeEvent(
+                model=model._meta.label_lower,
+                object_id=object_id,
+                organization_id=organization_id,
+                operation=operation,
+                data=data or {},
+            )
+            for object_id in object_ids
+        ]
+    )
+    transaction.on_commit(notifier.notify, using=using)
+
+
+def record_snapshots(instances, operation, using):
+    """
+    Writes one event per instance carrying all of its fields. Call inside
+    the transaction making the change.
+    """
+    ChangeEvent.objects.using(using).bulk_create(
+        [
+            ChangeEvent(
+                model=instance._meta.label_lower,
+                object_id=instance.pk,
+                organization_id=organization_of(instance),
+                operation=operation,
+                data=snapshot(instance),
+            )
+            for instance in instances
+        ]
+    )
+    transaction.on_commit(notifier.notify, using=using)
+
+
+def settled_through(using, since):
+    """
+    The sequence number below the first gap after `since` that a recent
+    event follows, or None if there is no such gap.
+    """
+    events = ChangeEvent.objects.using(using).filter(pk__gt=since)
+    cutoff = timezone.now() - timedelta(seconds=settings.ACCOUNTS_CHANGES_GAP_SECONDS)
+    recent = list(
+        events.filter(created_at__gte=cutoff).order_by("pk").values_list("pk", flat=True)
+    )
+    if not recent:
+        return None
+    previous = events.filter(pk__lt=recent[0]).aggregate(last=Max("pk"))["last"] or since
+    for pk in recent:
+        if pk != previous + 1:
+            return previous
+        previous = pk
+    return None
+
+
+def changes_since(using, since, limit, organization_id=None):
+    events = ChangeEvent.objects.using(using).filter(pk__gt=since)
+    settled = settled_through(using, since)
+    if settled is not None:
+        events = events.filter(pk__lte=settled)
+    if organization_id is not None:
+        events = events.filter(organization_id=organization_id)
+    return list(events.order_by("pk")[:limit])
+
+
+def wait_for_changes(using, since, limit, wait, organization_id=None):
+    """
+    Changes after `since`, waiting up to `wait` seconds for the first one.
+    """
+    deadline = time.monotonic() + min(wait, MAX_WAIT)
+    while True:
+        events = changes_since(using, since, limit, organization_id)
+        remaining = deadline - time.monotonic()
+        if events or remaining <= 0:
+            return events
+        notifier.wait(min(remaining, settings.ACCOUNTS_CHANGES_POLL_INTERVAL))
+
+
+def server_sent_event(event, serialize):
+    data = json.dumps(serialize(event), cls=DjangoJSONEncoder)
+    return f"id: {event.pk}\nevent: change\ndata: {data}\n\n"
+
+
+def event_stream(using, since, serialize, organization_id=None, limit=100):
+    """
+    Server-sent events for the changes after `since`, for at most
+    ACCOUNTS_CHANGES_STREAM_SECONDS; clients reconnect with Last-Event-ID.
+    """
+    deadline = time.monotonic() + settings.ACCOUNTS_CHANGES_STREAM_SECONDS
+    heartbeat = time.monotonic()
+    yield "retry: 1000\n\n"
+
+    while time.monotonic() < deadline:
+        events = changes_since(using, since, limit, organization_id)
+        for event in events:
+            yield server_sent_event(event, serialize)
+            since = event.pk
+        if events:
+            heartbeat = time.monotonic()
+            continue
+
+        if time.monotonic() - heartbeat >= 15:
+            yield ": keepalive\n\n"
+            heartbeat = time.monotonic()
+        notifier.wait(
+            min(deadline - time.monotonic(), settings.ACCOUNTS_CHANGES_POLL_INTERVAL)
+        )
+
+
+async def aevent_stream(using, since, serialize, organization_id=None, limit=100):
+    """
+    event_stream() for ASGI: Django buffers a synchronous iterator there,
+    so the stream is an async generator reading through sync_to_async.
+    """
+    deadline = time.monotonic() + settings.ACCOUNTS_CHANGES_STREAM_SECONDS
+    heartbeat = time.monotonic()
+    # Serialized in the same thread as the query, which may load relations
+    read = sync_to_async(
+        lambda since: [
+            (event.pk, server_sent_event(event, serialize))
+            for event in changes_since(using, since, limit, organization_id)
+        ]
+    )
+    yield "retry: 1000\n\n"
+
+    while time.monotonic() < deadline:
+        events = await read(since)
+        for since, message in events:
+            yield message
+        if events:
+            heartbeat = time.monotonic()
+            continue
+
+        if time.monotonic() - heartbeat >= 15:
+            yield ": keepalive\n\n"
+            heartbeat = time.monotonic()
+        await notifier.async_wait(
+            min(deadline - time.monotonic(), settings.ACCOUNTS_CHANGES_POLL_INTERVAL)
+        )
@@ -0,0 +1,72 @@
+import threading
+
+from django.conf import settings
+
+from .ttlcache import TTLCache
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls sharing a key into one execution: the first
+    caller (the leader) runs the function, callers arriving while it runs
+    (followers) wait and receive the same result or exception.
+    Coalescing is per process, which is enough to absorb request bursts
+    hitting one worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            total = self.leaders + self.followers
+            return {
+                "requests": total,
+                "executions": self.leaders,
+                "coalesced": self.followers,
+                "ratio": self.followers / total if total else 0.0,
+            }
+
+
+organization_reads = SingleFlight()
+
+# Last good (instance, data) per organization read, served while the
+# database is unavailable
+organization_snapshots = TTLCache(ttl=settings.ACCOUNTS_STALE_ORGANIZATION_SECONDS)
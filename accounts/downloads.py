@@ -0,0 +1,110 @@
+"""
+HTTP responses for object data.
+
+A whole object is returned as a FileResponse, which WSGI servers providing
+wsgi.file_wrapper (gunicorn, uWSGI) send with sendfile(2). A Range request
+is served from a read-only memory map of the blob, so only the requested
+pages are read, one chunk at a time.
+
+Under ASGI Django would consume either iterator into memory before sending
+it, so blob_response(asynchronous=True) wraps the chunks in an async
+iterator that reads each one in a worker thread.
+"""
+
+import mmap
+import re
+
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Inclusive (start, end) of a single-range Range header, or None to send
+    the whole object. Multiple ranges and malformed headers are ignored, as
+    RFC 9110 allows.
+    """
+    match = RANGE_RE.match((header or "").strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def mapped_chunks(file, start, end):
+    with file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for offset in range(start, end + 1, CHUNK_SIZE):
+            yield mapped[offset:min(offset + CHUNK_SIZE, end + 1)]
+
+
+def file_chunks(file):
+    with file:
+        yield from iter(lambda: file.read(CHUNK_SIZE), b"")
+
+
+async def async_chunks(chunks):
+    """
+    Reads a blocking chunk iterator in worker threads, so only one chunk
+    of the body is in memory at a time.
+    """
+    read = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (chunk := await read(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=False)()
+
+
+def blob_response(
+    store, digest, size, content_type="", range_header=None, asynchronous=False
+):
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    content_type = content_type or "application/octet-stream"
+    file = store.open(digest)
+    if byte_range is None and not asynchronous:
+        response = FileResponse(file, content_type=content_type)
+    elif byte_range is None:
+        response = StreamingHttpResponse(
+            async_chunks(file_chunks(file)), content_type=content_type
+        )
+        response["Content-Length"] = size
+    else:
+        start, end = byte_range
+        chunks = mapped_chunks(file, start, end)
+        response = StreamingHttpResponse(
+            async_chunks(chunks) if asynchronous else chunks,
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = f'"{digest}"'
+    return response
@@ -0,0 +1,169 @@
+"""
+Idempotency-Key support for retried POSTs.
+
+The first request carrying a key runs the view and stores its response;
+repeats from the same caller to the same endpoint get that response back
+without the view running again. Reusing a key with a different payload is
+rejected with 422, and a repeat arriving while the first request is still
+running gets 409. Stored responses are served from a per-process cache
+first and kept in the idempotency_keys table for
+ACCOUNTS_IDEMPOTENCY_KEY_TTL seconds, after which prune_idempotency_keys
+deletes them. Server errors are not stored, so clients can retry them.
+
+Responses carrying credentials, such as signup's tokens, are never
+stored: handlers decorated with store_response=False answer repeats with
+409 instead. Payloads are compared by an HMAC keyed with SECRET_KEY, with
+passwords left out, and anonymous callers are told apart by address.
+"""
+
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework import status
+from rest_framework.response import Response
+
+from .batch import after_commit
+from .models import IdempotencyKey
+from .ttlcache import TTLCache
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# A claim older than this belongs to a request that died before finishing
+LOCK_SECONDS = 60
+
+# Request fields left out of the stored payload hash
+SECRET_FIELDS = {"password"}
+
+# fingerprint -> (request_hash, status_code, data) of finished requests
+responses = TTLCache(ttl=settings.ACCOUNTS_IDEMPOTENCY_CACHE_TTL)
+
+
+def fingerprint(request, key):
+    if request.user.is_authenticated:
+        caller = str(request.user.pk)
+    else:
+        caller = "anonymous:" + request.META.get("REMOTE_ADDR", "")
+    raw = "\n".join([caller, request.method, request.path, key])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def hash_payload(data):
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    if isinstance(data, dict):
+        data = {name: value for name, value in data.items() if name not in SECRET_FIELDS}
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return salted_hmac("accounts.idempotency", payload, algorithm="sha256").hexdigest()
+
+
+def replay(entry, request_hash, store_response):
+    stored_hash, status_code, data = entry
+    if stored_hash != request_hash:
+        return Response(
+            {"detail": "Idempotency-Key was already used with a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if not store_response:
+        return Response(
+            {"detail": "A request with this Idempotency-Key has already completed."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    response = Response(data, status=status_code)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def claim(key_fingerprint, request_hash):
+    """
+    Returns None once this request owns the key, otherwise the row of the
+    request that does.
+    """
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    fingerprint=key_fingerprint, request_hash=request_hash
+                )
+            return None
+        except IntegrityError:
+            pass
+
+        existing = IdempotencyKey.objects.filter(fingerprint=key_fingerprint).first()
+        now = timezone.now()
+        if existing is not None:
+            expired = existing.created_at < now - timedelta(
+                seconds=settings.ACCOUNTS_IDEMPOTENCY_KEY_TTL
+            )
+            abandoned = existing.status_code is None and existing.created_at < now - timedelta(
+                seconds=LOCK_SECONDS
+            )
+            if not expired and not abandoned:
+                return existing
+            IdempotencyKey.objects.filter(
+                fingerprint=key_fingerprint, created_at=existing.created_at
+            ).delete()
+    return existing
+
+
+def idempotent(handler=None, *, store_response=True):
+    """
+    Makes a view's POST handler honour the Idempotency-Key header. Runs
+    after authentication, so keys are scoped to the caller. With
+    store_response=False only the outcome is kept and repeats get 409.
+    """
+    if handler is None:
+        return functools.partial(idempotent, store_response=store_response)
+
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": "Invalid Idempotency-Key."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        key_fingerprint = fingerprint(request, key)
+        request_hash = hash_payload(request.data)
+        entry = responses.get(key_fingerprint)
+        if entry is not None:
+            return replay(entry, request_hash, store_response)
+
+        existing = claim(key_fingerprint, request_hash)
+        if existing is not None:
+            if existing.status_code is None:
+                return Response(
+                    {"detail": "A request with this Idempotency-Key is in progress."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            entry = (existing.request_hash, existing.status_code, existing.response)
+            after_commit(functools.partial(responses.set, key_fingerprint, entry))
+            return replay(entry, request_hash, store_response)
+
+        claimed = IdempotencyKey.objects.filter(fingerprint=key_fingerprint)
+        try:
+            response = handler(view, request, *args, **kwargs)
+        except Exception:
+            claimed.delete()
+            raise
+
+        if response.status_code >= 500:
+            claimed.delete()
+            return response
+        data = response.data if store_response else None
+        claimed.update(status_code=response.status_code, response=data)
+        entry = (request_hash, response.status_code, data)
+        after_commit(functools.partial(responses.set, key_fingerprint, entry))
+        return response
+
+    return wrapper
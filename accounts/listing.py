@@ -0,0 +1,86 @@
+"""
+S3-style object listing over the (bucket, key) unique index.
+
+Pages are found by seeking, never by offset: the continuation token holds
+the smallest key the next page may start at, so every page costs one index
+seek plus max_keys rows however deep into the bucket it is. With a
+delimiter, each collapsed common prefix is skipped with one more seek past
+all of its keys rather than by reading them.
+"""
+
+import base64
+import binascii
+
+from django.core.exceptions import ValidationError
+
+MAX_KEYS = 1000
+
+
+def key_upper_bound(prefix):
+    """
+    Smallest string sorting after every key that starts with `prefix`.
+    """
+    while prefix and prefix[-1] == "\U0010ffff":
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def key_after(key):
+    # "\x00" is the smallest character, so this is the next possible key.
+    return key + "\x00"
+
+
+def encode_token(cursor):
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def decode_token(token):
+    try:
+        return base64.b64decode(token.encode(), altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValidationError("Invalid continuation token.")
+
+
+def common_prefix(key, prefix, delimiter):
+    if not delimiter:
+        return None
+    index = key.find(delimiter, len(prefix))
+    if index < 0:
+        return None
+    return key[:index + len(delimiter)]
+
+
+def list_objects(queryset, prefix="", delimiter="", cursor="", max_keys=MAX_KEYS):
+    """
+    One page of the keys in `queryset` starting with `prefix`, from
+    `cursor` on. Returns (objects, common_prefixes, next_cursor), where
+    next_cursor is None on the last page.
+    """
+    lower = max(prefix, cursor)
+    upper = key_upper_bound(prefix)
+    contents, common_prefixes = [], []
+
+    while True:
+        remaining = max_keys - len(contents) - len(common_prefixes)
+        rows = queryset.filter(key__gte=lower)
+        if upper is not None:
+            rows = rows.filter(key__lt=upper)
+        rows = list(rows.order_by("key")[:remaining + 1])
+
+        for obj in rows:
+            if len(contents) + len(common_prefixes) == max_keys:
+                return contents, common_prefixes, lower
+            common = common_prefix(obj.key, prefix, delimiter)
+            if common is not None:
+                common_prefixes.append(common)
+                lower = key_upper_bound(common)
+                break
+            contents.append(obj)
+            lower = key_after(obj.key)
+        else:
+            return contents, common_prefixes, None
+
+        if lower is None:
+            return contents, common_prefixes, None
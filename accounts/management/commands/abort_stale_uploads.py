@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from accounts.multipart import abort_stale
+
+
+class Command(BaseCommand):
+    help = "Aborts multipart uploads that were never completed and frees their parts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=float,
+            default=24,
+            help="Age in hours after which an open upload is abandoned.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, older_than, batch_size, **options):
+        aborted = abort_stale(timedelta(hours=older_than), batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Aborted {aborted} stale uploads."))
@@ -0,0 +1,82 @@
+import io
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from accounts.parsers import MessagePackParser
+from accounts.renderers import MessagePackRenderer
+
+
+def organization_payload(members, buckets):
+    """
+    Shaped like the organization detail and bucket listing responses.
+    """
+    now = timezone.now()
+    return {
+        "organization": {
+            "id": 1,
+            "name": "Acme",
+            "description": "Rockets and anvils",
+            "manager": 1,
+            "members": [
+                {"id": n, "email": f"user{n}@example.com", "name": f"User {n}"}
+                for n in range(1, members + 1)
+            ],
+            "storage_quota": 10 ** 12,
+            "storage_used": 123456789,
+            "created_at": now,
+            "updated_at": now,
+        },
+        "buckets": [
+            {
+                "id": n,
+                "name": f"bucket-{n}",
+                "path": f"/team-{n % 20}/bucket-{n}",
+                "created_at": now - timedelta(minutes=n),
+            }
+            for n in range(1, buckets + 1)
+        ],
+    }
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = "Compares render and parse time and payload size of JSON and MessagePack."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--members", type=int, default=5000)
+        parser.add_argument("--buckets", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, members, buckets, repeat, **options):
+        data = organization_payload(members, buckets)
+        formats = [
+            ("json", JSONRenderer(), JSONParser()),
+            ("msgpack", MessagePackRenderer(), MessagePackParser()),
+        ]
+
+        self.stdout.write(
+            f"{'format':<10}{'render ms':>12}{'parse ms':>12}{'bytes':>12}{'gzip bytes':>12}"
+        )
+        for name, renderer, parser in formats:
+            body = renderer.render(data)
+            render = best_of(repeat, lambda: renderer.render(data))
+            parse = best_of(repeat, lambda: parser.parse(io.BytesIO(body)))
+            self.stdout.write(
+                f"{name:<10}{render * 1000:>12.2f}{parse * 1000:>12.2f}"
+                f"{len(body):>12}{len(compress_string(body)):>12}"
+            )
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,50 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from accounts.blobstore import get_blob_store
+from accounts.models import Object
+from accounts.sharding import get_shards
+
+
+class Command(BaseCommand):
+    help = "Deletes blobs that no object on any shard references."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--grace",
+            type=float,
+            default=3600,
+            help=(
+                "Only consider blobs not written for this many seconds, so "
+                "uploads still being recorded are kept."
+            ),
+        )
+
+    def handle(self, *args, batch_size, grace, **options):
+        store = get_blob_store()
+        cutoff = time.time() - grace
+        candidates = (
+            digest for digest, modified in store.list() if modified < cutoff
+        )
+
+        removed = 0
+        while True:
+            batch = list(islice(candidates, batch_size))
+            if not batch:
+                break
+            referenced = set()
+            for using in get_shards():
+                referenced.update(
+                    Object.objects.using(using)
+                    .filter(digest__in=batch)
+                    .values_list("digest", flat=True)
+                )
+            for digest in batch:
+                if digest not in referenced:
+                    store.delete(digest)
+                    removed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} unreferenced blobs."))
@@ -0,0 +1,153 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from accounts import changefeed
+from accounts.models import Bucket, Organization
+from accounts.sharding import (
+    get_shards,
+    get_tenant_models,
+    shard_for_organization,
+    tenant_rows,
+)
+
+
+class Command(BaseCommand):
+    help = "Moves an organization's tenant data (buckets) to another shard."
+
+    def add_arguments(self, parser):
+        parser.add_argument("organization_id", type=int)
+        parser.add_argument("target", help="Database alias of the target shard.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--drain-seconds",
+            type=float,
+            default=10,
+            help="Time for writes already in progress to finish once the "
+            "organization is frozen, before copying starts.",
+        )
+
+    def handle(self, *args, organization_id, target, batch_size, drain_seconds, **options):
+        if target not in get_shards():
+            raise CommandError(f"Unknown shard '{target}'.")
+
+        try:
+            org = Organization.objects.get(pk=organization_id, deleted_at__isnull=True)
+        except Organization.DoesNotExist:
+            raise CommandError(f"Organization {organization_id} does not exist.")
+        if org.moving_since is not None:
+            raise CommandError(f"{org} is already being moved since {org.moving_since}.")
+
+        source = shard_for_organization(org)
+        if source == target:
+            self.stdout.write(f"{org} is already on {target}.")
+            return
+
+        models = get_tenant_models()
+
+        # Freeze writes to the tenant data, then let requests that loaded
+        # the organization before the freeze finish. The source keeps
+        # serving reads until the directory entry is switched.
+        org.moving_since = timezone.now()
+        org.save(update_fields=["moving_since"])
+        time.sleep(drain_seconds)
+
+        try:
+            with transaction.atomic(using=target):
+                for model in models:
+                    copied = self.copy_rows(model, org.pk, source, target, batch_size)
+                    self.stdout.write(f"Copied {copied} {model._meta.verbose_name_plural}.")
+                self.record_arrivals(org.pk, target, batch_size)
+        except BaseException:
+            org.moving_since = None
+            org.save(update_fields=["moving_since"])
+            raise
+
+        # Lookups by organization id read the directory, so every process
+        # switches to the target here.
+        org.shard = target
+        org.moving_since = None
+        org.save(update_fields=["shard", "moving_since"])
+
+        # Delete children before parents so no cascades are collected. The
+        # source feed records the buckets as moved rather than deleted.
+        with changefeed.moving_to(target):
+            for model in reversed(models):
+                deleted = self.delete_rows(model, org.pk, source, batch_size)
+                self.stdout.write(
+                    f"Removed {deleted} {model._meta.verbose_name_plural} from {source}."
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {org} from {source} to {target}."))
+
+    def copy_rows(self, model, organization_id, source, target, batch_size):
+        # Rows are copied column by column so primary keys and auto_now
+        # timestamps are preserved exactly. Keys are allocated from per-shard
+        # ranges (sharding.allocate_ids), so they are free on the target.
+        fields = model._meta.concrete_fields
+        connection = connections[target]
+        quote = connection.ops.quote_name
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            quote(model._meta.db_table),
+            ", ".join(quote(field.column) for field in fields),
+            ", ".join(["%s"] * len(fields)),
+        )
+
+        rows = tenant_rows(model, organization_id, source).order_by("pk")
+        rows = rows.values_list(*[field.attname for field in fields])
+
+        copied = 0
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                copied += self.insert_batch(model, batch, sql, fields, target)
+                batch = []
+        if batch:
+            copied += self.insert_batch(model, batch, sql, fields, target)
+        return copied
+
+    def record_arrivals(self, organization_id, target, batch_size):
+        # The copies are inserted with raw SQL, which sends no post_save, so
+        # their "created" events are written here in the same transaction.
+        buckets = tenant_rows(Bucket, organization_id, target).order_by("pk")
+        last_pk = 0
+        while True:
+            batch = list(buckets.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return
+            changefeed.record_snapshots(batch, "created", target)
+            last_pk = batch[-1].pk
+
+    def insert_batch(self, model, batch, sql, fields, target):
+        connection = connections[target]
+        pk_index = fields.index(model._meta.pk)
+        pks = [row[pk_index] for row in batch]
+        if model._base_manager.using(target).filter(pk__in=pks).exists():
+            raise CommandError(
+                f"Primary key collision for {model._meta.label} on {target}."
+            )
+
+        params = [
+            [
+                field.get_db_prep_value(value, connection, prepared=False)
+                for field, value in zip(fields, row)
+            ]
+            for row in batch
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        return len(batch)
+
+    def delete_rows(self, model, organization_id, source, batch_size):
+        deleted = 0
+        rows = tenant_rows(model, organization_id, source)
+        while True:
+            pks = list(rows.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                return deleted
+            with transaction.atomic(using=source):
+                model._base_manager.using(source).filter(pk__in=pks).delete()
+            deleted += len(pks)
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import ChangeEvent
+from accounts.sharding import get_shards
+
+
+class Command(BaseCommand):
+    help = "Deletes change feed events older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=7,
+            help="Days of changes consumers can still catch up on.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, days, batch_size, **options):
+        cutoff = timezone.now() - timedelta(days=days)
+        removed = 0
+        for using in get_shards():
+            expired = ChangeEvent.objects.using(using).filter(created_at__lt=cutoff)
+            while True:
+                pks = list(expired.order_by("pk").values_list("pk", flat=True)[:batch_size])
+                if not pks:
+                    break
+                ChangeEvent.objects.using(using).filter(pk__in=pks).delete()
+                removed += len(pks)
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} change events."))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Deletes stored Idempotency-Key responses older than ACCOUNTS_IDEMPOTENCY_KEY_TTL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, batch_size, **options):
+        cutoff = timezone.now() - timedelta(seconds=settings.ACCOUNTS_IDEMPOTENCY_KEY_TTL)
+        expired = IdempotencyKey.objects.filter(created_at__lt=cutoff)
+        removed = 0
+        while True:
+            pks = list(expired.order_by("created_at").values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            IdempotencyKey.objects.filter(pk__in=pks).delete()
+            removed += len(pks)
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} idempotency keys."))
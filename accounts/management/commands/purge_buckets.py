@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from accounts.archival import purge
+
+
+class Command(BaseCommand):
+    help = (
+        "Archives soft-deleted buckets in small batches and removes "
+        "organizations whose offboarding has completed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.05,
+            help="Seconds to sleep between batches.",
+        )
+
+    def handle(self, *args, batch_size, pause, **options):
+        archived, removed = purge(batch_size=batch_size, pause=pause)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {archived} buckets, removed {removed} organizations."
+            )
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from accounts.usage import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes bucket and organization storage usage from the objects and "
+        "staged upload parts and corrects counters that have drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, batch_size, **options):
+        corrected = reconcile(batch_size=batch_size)
+        self.stdout.write(
+            self.style.SUCCESS(f"Corrected {corrected} usage counters.")
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from accounts import rollups
+
+
+class Command(BaseCommand):
+    help = "Folds new audit events into the daily activity rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recompute all rollups from the retained audit events.",
+        )
+
+    def handle(self, *args, batch_size, rebuild, **options):
+        job = rollups.rebuild if rebuild else rollups.roll_up
+        counted = job(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {counted} events."))
@@ -0,0 +1,147 @@
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+
+# Runs in a fresh interpreter so every phase is measured cold.
+PROFILE_SCRIPT = """
+import json, os, sys, time
+
+phases = {}
+start = time.perf_counter()
+
+mark = time.perf_counter()
+import django
+from django.conf import settings
+phases["import_django"] = time.perf_counter() - mark
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", %(settings)r)
+
+mark = time.perf_counter()
+settings.INSTALLED_APPS
+phases["settings"] = time.perf_counter() - mark
+
+mark = time.perf_counter()
+from django.apps import apps
+apps.populate(settings.INSTALLED_APPS)
+phases["app_loading"] = time.perf_counter() - mark
+
+mark = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+get_resolver()._populate()
+phases["url_resolver"] = time.perf_counter() - mark
+
+mark = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+phases["middleware"] = time.perf_counter() - mark
+
+phases["total"] = time.perf_counter() - start
+phases["modules"] = len(sys.modules)
+print(json.dumps(phases))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures cold-start time in fresh interpreters: importing Django, "
+        "settings, app loading, URL resolver and middleware setup, plus "
+        "the slowest imports and optionally per-request overhead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--imports",
+            type=int,
+            default=15,
+            help="Number of slowest imports to list (0 to skip).",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=0,
+            help="Time this many in-process requests through the middleware stack.",
+        )
+        parser.add_argument(
+            "--path",
+            default="/accounts/organizations/1/details/",
+            help="Path requested by --requests; the default is rejected by "
+            "authentication before touching the database.",
+        )
+
+    def handle(self, *args, repeat, imports, requests, path, **options):
+        script = PROFILE_SCRIPT % {"settings": settings.SETTINGS_MODULE}
+
+        runs = [json.loads(self.run_child(script).stdout) for _ in range(repeat)]
+
+        self.stdout.write(f"Startup phases (median of {repeat} runs, ms):")
+        for phase in runs[0]:
+            if phase == "modules":
+                continue
+            median = statistics.median(run[phase] for run in runs) * 1000
+            self.stdout.write(f"  {phase:<16}{median:>10.1f}")
+        self.stdout.write(f"  {'modules loaded':<16}{runs[0]['modules']:>10}")
+
+        if imports:
+            self.stdout.write("\nSlowest imports (cumulative, ms):")
+            for cumulative, name in self.slowest_imports(script, imports):
+                self.stdout.write(f"  {cumulative / 1000:>10.1f}  {name}")
+
+        if requests:
+            per_request = self.time_requests(path, requests) * 1000
+            self.stdout.write(
+                f"\nRequest overhead ({len(settings.MIDDLEWARE)} middleware): "
+                f"{per_request:.3f} ms per GET {path}"
+            )
+
+    def time_requests(self, path, count):
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if "*" not in host), "localhost"
+        ).lstrip(".")
+        client = Client(HTTP_HOST=host)
+
+        # 4xx responses would otherwise log one warning per request.
+        logger = logging.getLogger("django.request")
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            client.get(path)
+            start = time.perf_counter()
+            for _ in range(count):
+                client.get(path)
+            return (time.perf_counter() - start) / count
+        finally:
+            logger.setLevel(level)
+
+    def run_child(self, script, *flags):
+        result = subprocess.run(
+            [sys.executable, *flags, "-c", script],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr)
+        return result
+
+    def slowest_imports(self, script, limit):
+        # -X importtime reports "self [us] | cumulative [us] | package".
+        stderr = self.run_child(script, "-X", "importtime").stderr
+        timings = []
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            # Only top-level imports, so nested modules are not counted twice.
+            if name.startswith(" ") and not name.startswith("  "):
+                timings.append((int(cumulative), name.strip()))
+        return sorted(timings, reverse=True)[:limit]
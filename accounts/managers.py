@@ -0,0 +1,58 @@
+from django.contrib.auth.models import UserManager as BaseUserManager
+from django.db import DEFAULT_DB_ALIAS, models, router
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
+
+from .sharding import allocate_ids, is_tenant_model, shard_for_organization
+
+
+class TenantQuerySet(models.QuerySet):
+    def for_organization(self, organization):
+        """
+        Rows of one organization, read from the shard that holds them.
+        Accepts an Organization instance or its id.
+        """
+        queryset = self
+        if is_tenant_model(self.model):
+            queryset = queryset.using(shard_for_organization(organization))
+        return queryset.filter(organization=organization)
+
+    def create(self, **kwargs):
+        # Without using(), the new row goes to its organization's shard
+        # rather than to the default database
+        if self._db is None and is_tenant_model(self.model):
+            return self.using(self.write_shard(self.model(**kwargs))).create(**kwargs)
+        return super().create(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if not objs or not is_tenant_model(self.model):
+            return super().bulk_create(objs, *args, **kwargs)
+        using = self._db or self.write_shard(objs[0])
+        new = [obj for obj in objs if obj.pk is None]
+        for obj, pk in zip(new, allocate_ids(self.model, using, len(new)) or []):
+            obj.pk = pk
+        return super(TenantQuerySet, self.using(using)).bulk_create(objs, *args, **kwargs)
+
+    def write_shard(self, instance):
+        return router.db_for_write(self.model, instance=instance) or DEFAULT_DB_ALIAS
+
+
+class TenantManager(models.Manager.from_queryset(TenantQuerySet)):
+    pass
+
+
+class LiveTenantManager(TenantManager):
+    """
+    Hides soft-deleted rows; they stay reachable through the model's
+    unfiltered manager until the purge job archives them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class UserManager(BaseUserManager.from_queryset(TenantQuerySet)):
+    def get_by_natural_key(self, username):
+        # Emails are unique case-insensitively; this lookup uses that index
+        return self.get(Exact(Lower(self.model.USERNAME_FIELD), username.lower()))
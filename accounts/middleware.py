@@ -0,0 +1,109 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+
+from .overload import DatabaseUnavailable, guard_queries, requests_in_flight
+
+# Scope key set by LoadSheddingApplication on the requests it admitted
+ADMITTED = "accounts.admitted"
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Gzips responses of at least ACCOUNTS_COMPRESSION_MIN_SIZE bytes for
+    clients that accept it. Small responses are not worth the CPU, and
+    streaming responses (event streams, object downloads) are left alone
+    so they are flushed as produced and keep serving byte ranges.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or len(response.content) < settings.ACCOUNTS_COMPRESSION_MIN_SIZE:
+            return response
+        return super().process_response(request, response)
+
+
+def unavailable(detail, retry_after):
+    response = JsonResponse({"detail": detail}, status=503)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def busy():
+    return unavailable("The server is busy, try again later.", 1)
+
+
+class LoadSheddingMiddleware:
+    """
+    Answers 503 at once while ACCOUNTS_MAX_IN_FLIGHT requests are already
+    being handled by this process. Requests admitted by
+    LoadSheddingApplication have been counted already.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if getattr(request, "scope", {}).get(ADMITTED):
+            return self.get_response(request)
+        if not requests_in_flight.acquire(settings.ACCOUNTS_MAX_IN_FLIGHT):
+            return busy()
+        try:
+            return self.get_response(request)
+        finally:
+            requests_in_flight.release()
+
+
+class LoadSheddingApplication:
+    """
+    LoadSheddingMiddleware for an ASGI application. Django starts a thread
+    per request for the synchronous middleware and views, and only after
+    it has read the whole request body; counting requests here, on the
+    event loop, also covers bodies being received and async streaming
+    responses, which hold no thread while they wait.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.application(scope, receive, send)
+        if not requests_in_flight.acquire(settings.ACCOUNTS_MAX_IN_FLIGHT):
+            response = busy()
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": response.status_code,
+                    "headers": [(name.encode(), value.encode()) for name, value in response.items()],
+                }
+            )
+            return await send({"type": "http.response.body", "body": response.content})
+        try:
+            return await self.application({**scope, ADMITTED: True}, receive, send)
+        finally:
+            requests_in_flight.release()
+
+
+class DatabaseCircuitMiddleware:
+    """
+    Runs the request's queries through the circuit breakers of
+    accounts.overload. Views built on DRF turn DatabaseUnavailable into a
+    503 themselves; this covers the rest.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(guard_queries(alias)))
+            return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, DatabaseUnavailable):
+            return unavailable(str(exception.detail), exception.wait)
+        return None
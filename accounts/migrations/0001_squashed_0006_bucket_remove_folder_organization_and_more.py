@@ -0,0 +1,379 @@
+# Generated by Django 4.2.26 on 2026-10-19 16:41
+
+from django.conf import settings
+import django.contrib.auth.models
+import django.contrib.auth.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    # Squash of 0001-0006. AccessControlEntry, created and dropped again in
+    # that range, is gone entirely. Folder and File only exist in the
+    # migration state until 0010 removes them; their tables are never
+    # created on a fresh database.
+
+    replaces = [
+        ("accounts", "0001_initial"),
+        ("accounts", "0002_rename_can_delete_accesscontrolentry_can_execute_and_more"),
+        (
+            "accounts",
+            "0003_remove_accesscontrolentry_user_or_organization_not_both_and_more",
+        ),
+        ("accounts", "0004_delete_accesscontrolentry"),
+        ("accounts", "0005_organization_manager"),
+        ("accounts", "0006_bucket_remove_folder_organization_and_more"),
+    ]
+
+    initial = True
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="User",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("password", models.CharField(max_length=128, verbose_name="password")),
+                (
+                    "last_login",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="last login"
+                    ),
+                ),
+                (
+                    "is_superuser",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Designates that this user has all permissions without explicitly assigning them.",
+                        verbose_name="superuser status",
+                    ),
+                ),
+                (
+                    "username",
+                    models.CharField(
+                        error_messages={
+                            "unique": "A user with that username already exists."
+                        },
+                        help_text="Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.",
+                        max_length=150,
+                        unique=True,
+                        validators=[
+                            django.contrib.auth.validators.UnicodeUsernameValidator()
+                        ],
+                        verbose_name="username",
+                    ),
+                ),
+                (
+                    "first_name",
+                    models.CharField(
+                        blank=True, max_length=150, verbose_name="first name"
+                    ),
+                ),
+                (
+                    "last_name",
+                    models.CharField(
+                        blank=True, max_length=150, verbose_name="last name"
+                    ),
+                ),
+                (
+                    "is_staff",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Designates whether the user can log into this admin site.",
+                        verbose_name="staff status",
+                    ),
+                ),
+                (
+                    "is_active",
+                    models.BooleanField(
+                        default=True,
+                        help_text="Designates whether this user should be treated as active. Unselect this instead of deleting accounts.",
+                        verbose_name="active",
+                    ),
+                ),
+                (
+                    "date_joined",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="date joined"
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("email", models.EmailField(max_length=254, unique=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "groups",
+                    models.ManyToManyField(
+                        blank=True,
+                        help_text="The groups this user belongs to. A user will get all permissions granted to each of their groups.",
+                        related_name="user_set",
+                        related_query_name="user",
+                        to="auth.group",
+                        verbose_name="groups",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "users",
+            },
+            managers=[
+                ("objects", django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Organization",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("description", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "manager",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="managed_organizations",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "organizations",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="Bucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="buckets",
+                        to="accounts.organization",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "buckets",
+            },
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="organization",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="members",
+                to="accounts.organization",
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="user_permissions",
+            field=models.ManyToManyField(
+                blank=True,
+                help_text="Specific permissions for this user.",
+                related_name="user_set",
+                related_query_name="user",
+                to="auth.permission",
+                verbose_name="user permissions",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bucket",
+            index=models.Index(fields=["name"], name="buckets_name_f837aa_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="bucket",
+            index=models.Index(
+                fields=["organization", "created_at"], name="buckets_organiz_c4f120_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="bucket",
+            constraint=models.UniqueConstraint(
+                fields=("name", "organization"), name="unique_bucket_name_per_org"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["organization", "email"], name="users_organiz_6d79e1_idx"
+            ),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="Folder",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        ("name", models.CharField(max_length=255)),
+                        ("created_at", models.DateTimeField(auto_now_add=True)),
+                        ("updated_at", models.DateTimeField(auto_now=True)),
+                        (
+                            "organization",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="folders",
+                                to="accounts.organization",
+                            ),
+                        ),
+                        (
+                            "owner",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="owned_folders",
+                                to=settings.AUTH_USER_MODEL,
+                            ),
+                        ),
+                        (
+                            "parent",
+                            models.ForeignKey(
+                                blank=True,
+                                null=True,
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="children",
+                                to="accounts.folder",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "folders",
+                    },
+                ),
+                migrations.CreateModel(
+                    name="File",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        ("name", models.CharField(max_length=255)),
+                        ("path", models.CharField(max_length=1024)),
+                        ("size", models.BigIntegerField(default=0)),
+                        ("mime_type", models.CharField(blank=True, max_length=255)),
+                        ("created_at", models.DateTimeField(auto_now_add=True)),
+                        ("updated_at", models.DateTimeField(auto_now=True)),
+                        (
+                            "folder",
+                            models.ForeignKey(
+                                blank=True,
+                                null=True,
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="files",
+                                to="accounts.folder",
+                            ),
+                        ),
+                        (
+                            "organization",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="files",
+                                to="accounts.organization",
+                            ),
+                        ),
+                        (
+                            "owner",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="owned_files",
+                                to=settings.AUTH_USER_MODEL,
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "files",
+                    },
+                ),
+                migrations.AddIndex(
+                    model_name="folder",
+                    index=models.Index(
+                        fields=["parent", "name"], name="folders_parent__25e0ff_idx"
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="folder",
+                    index=models.Index(
+                        fields=["organization", "created_at"],
+                        name="folders_organiz_878f96_idx",
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="file",
+                    index=models.Index(
+                        fields=["folder", "name"], name="files_folder__234be0_idx"
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="file",
+                    index=models.Index(
+                        fields=["organization", "created_at"],
+                        name="files_organiz_664ec5_idx",
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="file",
+                    index=models.Index(
+                        fields=["owner"], name="files_owner_i_32cd9a_idx"
+                    ),
+                ),
+                migrations.AddConstraint(
+                    model_name="folder",
+                    constraint=models.UniqueConstraint(
+                        fields=("parent", "name", "organization"),
+                        name="unique_folder_name_per_parent",
+                    ),
+                ),
+            ],
+        ),
+    ]
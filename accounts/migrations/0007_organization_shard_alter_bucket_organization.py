@@ -0,0 +1,47 @@
+# Generated by Django 4.2.26 on 2026-10-19 16:34
+
+import accounts.managers
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def place_existing_organizations(apps, schema_editor):
+    # Organizations created before sharding keep their buckets on default.
+    Organization = apps.get_model("accounts", "Organization")
+    Organization.objects.using(schema_editor.connection.alias).filter(
+        shard=""
+    ).update(shard="default")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0006_bucket_remove_folder_organization_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name="user",
+            managers=[
+                ("objects", accounts.managers.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="organization",
+            name="shard",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.RunPython(
+            place_existing_organizations, migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name="bucket",
+            name="organization",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="buckets",
+                to="accounts.organization",
+            ),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.26 on 2026-10-19 16:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.manager
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0008_auditevent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BucketArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("name", models.CharField(max_length=255)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("deleted_at", models.DateTimeField()),
+                (
+                    "archived_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "db_table": "buckets_archive",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="bucket",
+            options={"base_manager_name": "all_objects"},
+        ),
+        migrations.AlterModelManagers(
+            name="bucket",
+            managers=[
+                ("objects", django.db.models.manager.Manager()),
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name="bucket",
+            name="unique_bucket_name_per_org",
+        ),
+        migrations.AddField(
+            model_name="bucket",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="organization",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="bucket",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)),
+                fields=["deleted_at"],
+                name="buckets_pending_purge_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="bucket",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=("name", "organization"),
+                name="unique_bucket_name_per_org",
+            ),
+        ),
+        migrations.AddField(
+            model_name="bucketarchive",
+            name="organization",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="accounts.organization",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bucketarchive",
+            index=models.Index(
+                fields=["organization", "deleted_at"],
+                name="buckets_arc_organiz_f80a23_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.26 on 2026-10-19 16:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0009_bucket_soft_delete_bucketarchive"),
+    ]
+
+    operations = [
+        # Databases migrated before the squash still have these tables;
+        # fresh ones built from 0001_squashed_0006 never created them.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name="folder",
+                    name="organization",
+                ),
+                migrations.RemoveField(
+                    model_name="folder",
+                    name="owner",
+                ),
+                migrations.RemoveField(
+                    model_name="folder",
+                    name="parent",
+                ),
+                migrations.DeleteModel(
+                    name="File",
+                ),
+                migrations.DeleteModel(
+                    name="Folder",
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL("DROP TABLE IF EXISTS files", migrations.RunSQL.noop),
+                migrations.RunSQL("DROP TABLE IF EXISTS folders", migrations.RunSQL.noop),
+            ],
+        ),
+    ]
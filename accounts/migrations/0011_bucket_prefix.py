@@ -0,0 +1,29 @@
+# Generated by Django 4.2.26 on 2026-10-19 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0010_delete_file_folder"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bucket",
+            name="prefix",
+            field=models.CharField(default="/", max_length=1024),
+        ),
+        migrations.AddField(
+            model_name="bucketarchive",
+            name="prefix",
+            field=models.CharField(default="/", max_length=1024),
+        ),
+        migrations.AddIndex(
+            model_name="bucket",
+            index=models.Index(
+                fields=["organization", "prefix"], name="buckets_org_prefix_idx"
+            ),
+        ),
+    ]
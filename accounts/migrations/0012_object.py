@@ -0,0 +1,51 @@
+# Generated by Django 4.2.26 on 2026-10-19 16:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0011_bucket_prefix"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Object",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=1024)),
+                ("size", models.BigIntegerField(default=0)),
+                ("checksum", models.CharField(blank=True, max_length=64)),
+                ("content_type", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "bucket",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="contents",
+                        to="accounts.bucket",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "objects",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="object",
+            constraint=models.UniqueConstraint(
+                fields=("bucket", "key"), name="unique_object_key_per_bucket"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0012_object"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="object",
+            name="digest",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
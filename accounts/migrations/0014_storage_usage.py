@@ -0,0 +1,28 @@
+# Generated by Django 4.2.26 on 2026-10-19 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0013_object_digest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bucket",
+            name="storage_used",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="organization",
+            name="storage_quota",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="organization",
+            name="storage_used",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.26 on 2026-10-19 16:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0014_storage_usage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MultipartUpload",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("key", models.CharField(max_length=1024)),
+                ("content_type", models.CharField(blank=True, max_length=255)),
+                ("initiated_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "bucket",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="uploads",
+                        to="accounts.bucket",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "multipart_uploads",
+            },
+        ),
+        migrations.CreateModel(
+            name="UploadPart",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("part_number", models.PositiveIntegerField()),
+                ("size", models.BigIntegerField()),
+                ("etag", models.CharField(max_length=64)),
+                ("uploaded_at", models.DateTimeField(auto_now=True)),
+                (
+                    "upload",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="parts",
+                        to="accounts.multipartupload",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "multipart_upload_parts",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="uploadpart",
+            constraint=models.UniqueConstraint(
+                fields=("upload", "part_number"), name="unique_part_number_per_upload"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="multipartupload",
+            index=models.Index(
+                fields=["initiated_at"], name="multipart_u_initiat_8aa5a1_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:13
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0019_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="user",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("email"),
+                name="unique_user_email_ci",
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0020_user_email_ci"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupCursor",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("position", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "rollup_cursors",
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("members_joined", models.PositiveIntegerField(default=0)),
+                ("members_left", models.PositiveIntegerField(default=0)),
+                ("buckets_created", models.PositiveIntegerField(default=0)),
+                ("buckets_deleted", models.PositiveIntegerField(default=0)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="accounts.organization",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "daily_rollups",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="dailyrollup",
+            constraint=models.UniqueConstraint(
+                fields=("organization", "day"), name="unique_rollup_per_day"
+            ),
+        ),
+    ]
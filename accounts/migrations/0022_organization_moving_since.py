@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0021_daily_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organization",
+            name="moving_since",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0022_organization_moving_since"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="bucket",
+            name="buckets_org_prefix_idx",
+        ),
+        migrations.AddIndex(
+            model_name="bucket",
+            index=models.Index(
+                fields=["organization", "prefix", "name"],
+                name="buckets_org_prefix_name_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0023_bucket_listing_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organization",
+            name="acl_version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0024_organization_acl_version"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="changeevent",
+            name="operation",
+            field=models.CharField(
+                choices=[
+                    ("created", "Created"),
+                    ("updated", "Updated"),
+                    ("deleted", "Deleted"),
+                    ("moved", "Moved to another shard"),
+                ],
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.26 on 2026-10-19 18:02
+
+from django.db import migrations
+
+
+def clear_idempotency_keys(apps, schema_editor):
+    # Stored rows may hold signup tokens and unkeyed password hashes; the
+    # new payload hashes would not match them anyway.
+    IdempotencyKey = apps.get_model("accounts", "IdempotencyKey")
+    IdempotencyKey.objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0025_change_event_moved"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_idempotency_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0026_clear_idempotency_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rollupcursor",
+            name="gaps",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0027_rollup_cursor_gaps"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdSequence",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("next_id", models.BigIntegerField()),
+            ],
+            options={
+                "db_table": "id_sequences",
+            },
+        ),
+    ]
@@ -1,8 +1,51 @@
-from django.db import models
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
+from django.conf import settings
+
+from .managers import LiveTenantManager, TenantManager, UserManager
+from .sharding import pick_shard
+
+COUNTER_FIELDS = {'storage_used', 'acl_version'}
+
+
+def preserve_counters(instance, kwargs):
+    """
+    Keeps a full save() of an existing row from writing back a stale copy
+    of the counters (usage, ACL version), which only change through F()
+    updates.
+    """
+    if instance._state.adding or kwargs.get("force_insert"):
+        return
+    if kwargs.get("update_fields") is None:
+        kwargs["update_fields"] = [
+            field.name
+            for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name not in COUNTER_FIELDS
+        ]
 
-class Organization(models.Model):
+
+class ChangeTrackedModel(models.Model):
+    """
+    Saves in a transaction, so the ChangeEvent written by the post_save
+    receiver commits or rolls back together with the row.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class Organization(ChangeTrackedModel):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True)
 
@@ -14,33 +57,91 @@ class Organization(models.Model):
         related_name='managed_organizations'
     )
 
+    # Database alias holding this organization's buckets; assigned on
+    # creation and changed only by the move_organization command.
+    shard = models.CharField(max_length=64, blank=True, default="")
+    # Set by move_organization while the buckets are copied to another
+    # shard; writes to tenant data are refused until the move completes.
+    moving_since = models.DateTimeField(null=True, blank=True)
+
+    # Bytes the organization may store (unlimited when empty) and bytes
+    # stored, kept up to date incrementally by accounts.usage.
+    storage_quota = models.BigIntegerField(null=True, blank=True)
+    storage_used = models.BigIntegerField(default=0)
+
+    # Bumped by every bucket grant or group membership change; part of the
+    # cache key of the permission indexes in accounts.acl.
+    acl_version = models.PositiveIntegerField(default=1)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when offboarding starts; the purge_buckets job archives the
+    # buckets and then deletes the row.
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         db_table = 'organizations'
         ordering = ['name']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted manager so save() only re-validates
+        # membership when manager_id actually changes.
+        instance._loaded_manager_id = instance.__dict__.get("manager_id")
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None or "manager" in fields or "manager_id" in fields:
+            self._loaded_manager_id = self.manager_id
+
+    def manager_changed(self):
+        """
+        True when manager_id differs from the value loaded from the
+        database (always True for instances that were never loaded).
+        """
+        if not hasattr(self, "_loaded_manager_id"):
+            return True
+        return self.manager_id != self._loaded_manager_id
+
     def clean(self):
         """
         Ensures: If a manager is assigned, that manager must belong
         to this organization.
+        Uses manager_id and a single EXISTS query, and only when the
+        manager changed since the row was loaded.
         This works across ALL database backends.
         """
-        if self.manager:
-            if self.manager.organization_id != self.id:
-                raise ValidationError("Manager must be a member of this organization.")
+        if self.manager_id is None or not self.manager_changed():
+            return
+        is_member = User.objects.filter(
+            id=self.manager_id, organization_id=self.id
+        ).exists()
+        if not is_member:
+            raise ValidationError("Manager must be a member of this organization.")
 
     def save(self, *args, **kwargs):
-        # Always run clean() before saving
-        self.clean()
+        update_fields = kwargs.get("update_fields")
+        touches_manager = update_fields is None or (
+            {"manager", "manager_id"} & set(update_fields)
+        )
+        # Skip the app-side check when the database trigger enforces it.
+        if touches_manager and not settings.ACCOUNTS_MANAGER_MEMBERSHIP_TRIGGER:
+            self.clean()
+        if not self.shard:
+            self.shard = pick_shard(self)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "shard"}
+        preserve_counters(self, kwargs)
         super().save(*args, **kwargs)
+        self._loaded_manager_id = self.manager_id
 
     def __str__(self):
         return self.name
 
 
-class User(AbstractUser):
+class User(ChangeTrackedModel, AbstractUser):
     name = models.CharField(max_length=255)
     email = models.EmailField(unique=True)
     organization = models.ForeignKey(
@@ -53,6 +154,8 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = UserManager()
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'name']
     
@@ -61,29 +164,412 @@ class User(AbstractUser):
         indexes = [
             models.Index(fields=['organization', 'email']),
         ]
+        constraints = [
+            # Emails are compared case-insensitively; see accounts.signup
+            models.UniqueConstraint(Lower('email'), name='unique_user_email_ci'),
+        ]
     
     def __str__(self):
         return self.email
 
 
-class Bucket(models.Model):
+class ApiKey(models.Model):
+    """
+    A credential for machine clients, acting as `user` within
+    `organization`. See accounts.authentication for the key format.
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='api_keys')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_keys')
+    name = models.CharField(max_length=255)
+    prefix = models.CharField(max_length=16, unique=True)
+    hashed_key = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'api_keys'
+
+    def __str__(self):
+        return f"{self.name} ({self.prefix})"
+
+
+class Bucket(ChangeTrackedModel):
     name = models.CharField(max_length=255)
-    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='buckets')
+    # Buckets may live on another shard than their organization, so the
+    # relation is not enforced by the database.
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+        db_constraint=False,
+    )
+    # Folder the bucket lives in, e.g. "/team/a/"; see accounts.namespace.
+    prefix = models.CharField(max_length=1024, default='/')
+    # Bytes stored in the bucket, kept up to date by accounts.usage.
+    storage_used = models.BigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Soft-deleted buckets are hidden from `objects` and moved to
+    # BucketArchive in small batches by the purge_buckets command.
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveTenantManager()
+    all_objects = TenantManager()
     
     class Meta:
         db_table = 'buckets'
+        base_manager_name = 'all_objects'
         indexes = [
             models.Index(fields=['name']),
             models.Index(fields=['organization', 'created_at']),
+            models.Index(
+                fields=['organization', 'prefix', 'name'], name='buckets_org_prefix_name_idx'
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                condition=models.Q(deleted_at__isnull=False),
+                name='buckets_pending_purge_idx'
+            ),
         ]
         constraints = [
             models.UniqueConstraint(
                 fields=['name', 'organization'],
+                condition=models.Q(deleted_at__isnull=True),
                 name='unique_bucket_name_per_org'
             ),
         ]
     
+    def save(self, *args, **kwargs):
+        preserve_counters(self, kwargs)
+        super().save(*args, **kwargs)
+
+    @property
+    def path(self):
+        return self.prefix + self.name
+
+    def __str__(self):
+        return self.name
+
+
+class BucketGrant(models.Model):
+    """
+    Permissions on one bucket for a user, or for every user in a group.
+    A bucket without grants is open to all members of its organization;
+    once it has any, only grantees and the organization manager can use
+    it. Evaluated through the cached per-user index in accounts.acl.
+    """
+    bucket = models.ForeignKey(Bucket, on_delete=models.CASCADE, related_name='grants')
+    # Copied from the bucket so an organization's grants are one index scan
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    user = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='+',
+    )
+    group = models.ForeignKey(
+        'auth.Group',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='+',
+    )
+    can_read = models.BooleanField(default=False)
+    can_write = models.BooleanField(default=False)
+    can_execute = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'bucket_grants'
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(user__isnull=False, group__isnull=True)
+                    | models.Q(user__isnull=True, group__isnull=False)
+                ),
+                name='grant_user_or_group'
+            ),
+            models.UniqueConstraint(
+                fields=['bucket', 'user'],
+                condition=models.Q(user__isnull=False),
+                name='unique_user_grant_per_bucket'
+            ),
+            models.UniqueConstraint(
+                fields=['bucket', 'group'],
+                condition=models.Q(group__isnull=False),
+                name='unique_group_grant_per_bucket'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.organization_id = self.bucket.organization_id
+        super().save(*args, **kwargs)
+
+
+class Object(models.Model):
+    """
+    Metadata of one object stored in a bucket. Lives on the bucket's shard;
+    listing walks the (bucket, key) unique index with keyset pagination.
+    """
+    bucket = models.ForeignKey(Bucket, on_delete=models.CASCADE, related_name='contents')
+    key = models.CharField(max_length=1024)
+    size = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True)
+    content_type = models.CharField(max_length=255, blank=True)
+    # SHA-256 of the uploaded data in the blob store; empty when only
+    # metadata was written
+    digest = models.CharField(max_length=64, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'objects'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bucket', 'key'],
+                name='unique_object_key_per_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class MultipartUpload(models.Model):
+    """
+    An object being uploaded in parts. The parts are staged in the blob
+    store until the upload is completed or aborted; uploads left alone for
+    too long are aborted by the abort_stale_uploads command.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    bucket = models.ForeignKey(Bucket, on_delete=models.CASCADE, related_name='uploads')
+    key = models.CharField(max_length=1024)
+    content_type = models.CharField(max_length=255, blank=True)
+    initiated_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'multipart_uploads'
+        indexes = [
+            models.Index(fields=['initiated_at']),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class UploadPart(models.Model):
+    upload = models.ForeignKey(MultipartUpload, on_delete=models.CASCADE, related_name='parts')
+    part_number = models.PositiveIntegerField()
+    size = models.BigIntegerField()
+    etag = models.CharField(max_length=64)
+    uploaded_at = models.DateTimeField(auto_now=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'multipart_upload_parts'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['upload', 'part_number'],
+                name='unique_part_number_per_upload'
+            ),
+        ]
+
+
+class BucketArchive(models.Model):
+    """
+    Cold storage for purged buckets, keyed by the original bucket id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=255)
+    prefix = models.CharField(max_length=1024, default='/')
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    deleted_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'buckets_archive'
+        indexes = [
+            models.Index(fields=['organization', 'deleted_at']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ChangeEvent(models.Model):
+    """
+    Outbox row for one saved, deleted or moved Organization, User or
+    Bucket, written in the same transaction as the change, on the same
+    database. The id is the sequence number of the change feed; see
+    accounts.changefeed.
+    """
+    OPERATIONS = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+        ('moved', 'Moved to another shard'),
+    ]
+
+    model = models.CharField(max_length=64)
+    object_id = models.BigIntegerField()
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='+',
+    )
+    operation = models.CharField(max_length=16, choices=OPERATIONS)
+    # Values of the saved fields, by column name
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = 'change_events'
+        indexes = [
+            models.Index(fields=['organization', 'id']),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    The first response to a request sent with an Idempotency-Key header.
+    `fingerprint` hashes the caller, the endpoint and the key, and
+    `request_hash` the payload; `status_code` is null while the first
+    request is still running. See accounts.idempotency.
+    """
+    fingerprint = models.CharField(max_length=64, primary_key=True)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+
+
+class DailyRollup(models.Model):
+    """
+    Per-organization activity counters for one day, folded in from the
+    audit log by accounts.rollups so reports never scan users or buckets.
+    """
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    day = models.DateField()
+    members_joined = models.PositiveIntegerField(default=0)
+    members_left = models.PositiveIntegerField(default=0)
+    buckets_created = models.PositiveIntegerField(default=0)
+    buckets_deleted = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'daily_rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'day'], name='unique_rollup_per_day'),
+        ]
+
+
+class IdSequence(models.Model):
+    """
+    The next primary key a shard hands out for a tenant model, from that
+    shard's range (see sharding.allocate_ids). One row per model on every
+    shard.
+    """
+    name = models.CharField(max_length=64, primary_key=True)
+    next_id = models.BigIntegerField()
+
+    class Meta:
+        db_table = 'id_sequences'
+
+
+class RollupCursor(models.Model):
+    """
+    The last audit event folded into the rollups, and the lower ids not
+    seen yet with the time they were first passed over.
+    """
+    name = models.CharField(max_length=64, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    gaps = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'rollup_cursors'
+
+
+class AuditEvent(models.Model):
+    """
+    Append-only record of a mutation. Events are written in batches by
+    accounts.audit.AuditWriter; rows are never updated or deleted by the
+    application. `month` (YYYYMM) is the partition key used for retention.
+    """
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='+'
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='+'
+    )
+    action = models.CharField(max_length=64)
+    target_type = models.CharField(max_length=64, blank=True)
+    target_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict, blank=True)
+    month = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'audit_events'
+        indexes = [
+            models.Index(fields=['organization', 'created_at']),
+            models.Index(fields=['month']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Audit events are append-only.")
+        if self.month is None:
+            self.month = self.created_at.year * 100 + self.created_at.month
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Audit events are append-only.")
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"{self.action} ({self.created_at:%Y-%m-%d %H:%M:%S})"
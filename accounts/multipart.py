@@ -0,0 +1,173 @@
+"""
+Multipart uploads: an object sent as independently uploaded, retryable
+parts, staged in the blob store and concatenated when completed.
+
+Staged parts count against the quota from the moment they are uploaded,
+so an upload can never hold more than the organization may store. When
+the upload is completed the object takes over the charge of the parts it
+is made of; aborting gives the charge of every staged part back.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .blobstore import get_blob_store
+from .models import MultipartUpload
+from .sharding import get_shards
+from .usage import charge
+
+MAX_PART_NUMBER = 10000
+
+
+def staged_size(upload):
+    return upload.parts.aggregate(total=Sum("size"))["total"] or 0
+
+
+def upload_part(bucket, upload, part_number, chunks, size):
+    """
+    Stages one part and returns (etag, size). `size` is the part's
+    Content-Length, charged before anything is written; re-uploading a
+    part number replaces the part and its charge. Raises QuotaExceeded
+    when the part does not fit.
+    """
+    estimate = (
+        upload.parts.filter(part_number=part_number).values_list("size", flat=True).first()
+    ) or 0
+    delta = size - estimate
+    charge(bucket, delta)
+
+    try:
+        etag, written = get_blob_store().write_part(upload.pk, part_number, chunks)
+        with transaction.atomic(using=bucket._state.db):
+            previous = (
+                upload.parts.select_for_update()
+                .filter(part_number=part_number)
+                .values_list("size", flat=True)
+                .first()
+            ) or 0
+            upload.parts.update_or_create(
+                part_number=part_number, defaults={"size": written, "etag": etag}
+            )
+    except Exception:
+        charge(bucket, -delta)
+        raise
+    charge(bucket, written - size - (previous - estimate), enforce=False)
+    return etag, written
+
+
+def claim(upload):
+    """
+    Locks and deletes an upload, with its parts, in the caller's
+    transaction and returns the size of the parts. Raises
+    MultipartUpload.DoesNotExist when a concurrent complete or abort got
+    there first, so the charge of the parts is settled only once.
+    """
+    uploads = MultipartUpload.objects.using(upload._state.db).filter(pk=upload.pk)
+    list(uploads.select_for_update().values_list("pk", flat=True))
+    staged = staged_size(upload)
+    _, deleted = uploads.delete()
+    if not deleted.get(MultipartUpload._meta.label):
+        raise MultipartUpload.DoesNotExist
+    return staged
+
+
+def complete(bucket, upload, parts=None):
+    """
+    Assembles an upload into its object and returns the object. `parts`
+    lists (part_number, etag) pairs in ascending order; every uploaded
+    part is used when it is None. Raises ValidationError for unknown
+    parts or stale etags, and MultipartUpload.DoesNotExist when the upload
+    was completed or aborted meanwhile.
+    """
+    uploaded = {part.part_number: part for part in upload.parts.all()}
+    if parts is None:
+        part_numbers = sorted(uploaded)
+    else:
+        part_numbers = [part_number for part_number, _ in parts]
+        if part_numbers != sorted(set(part_numbers)):
+            raise ValidationError("Parts must be listed in ascending order.")
+        for part_number, etag in parts:
+            if part_number not in uploaded or uploaded[part_number].etag != etag:
+                raise ValidationError(f"Part {part_number} was not uploaded.")
+    if not part_numbers:
+        raise ValidationError("No parts were uploaded.")
+
+    store = get_blob_store()
+    upload_id = upload.pk
+    try:
+        digest, size = store.assemble(upload_id, part_numbers)
+    except FileNotFoundError:
+        # The parts were discarded by a concurrent complete or abort
+        raise MultipartUpload.DoesNotExist
+    with transaction.atomic(using=bucket._state.db):
+        staged = claim(upload)
+        previous = (
+            bucket.contents.select_for_update()
+            .filter(key=upload.key)
+            .values_list("size", flat=True)
+            .first()
+        ) or 0
+        obj, _ = bucket.contents.update_or_create(
+            key=upload.key,
+            defaults={
+                "size": size,
+                "checksum": digest,
+                "digest": digest,
+                "content_type": upload.content_type,
+            },
+        )
+
+    # Every staged part was charged already; the object replaces them and
+    # whatever the key held before, so this never adds usage.
+    charge(bucket, size - previous - staged, enforce=False)
+    store.discard_upload(upload_id)
+    return obj
+
+
+def abort(upload):
+    """
+    Discards an upload and gives the charge of its staged parts back.
+    Raises MultipartUpload.DoesNotExist when it was completed or aborted
+    meanwhile.
+    """
+    upload_id = upload.pk
+    with transaction.atomic(using=upload._state.db):
+        staged = claim(upload)
+    charge(upload.bucket, -staged)
+    get_blob_store().discard_upload(upload_id)
+
+
+def abort_stale(age, batch_size=500):
+    """
+    Aborts uploads initiated more than `age` (a timedelta) ago on every
+    shard, batch_size at a time. Returns the number aborted.
+    """
+    cutoff = timezone.now() - age
+    aborted = 0
+    for using in get_shards():
+        stale = MultipartUpload.objects.using(using).filter(initiated_at__lt=cutoff)
+        while True:
+            batch = list(stale.select_related("bucket").order_by("initiated_at")[:batch_size])
+            if not batch:
+                break
+            for upload in batch:
+                try:
+                    abort(upload)
+                except MultipartUpload.DoesNotExist:
+                    continue
+                aborted += 1
+    return aborted
+
+
+def abort_bucket_uploads(using, bucket_ids):
+    """
+    Aborts the uploads still open in buckets that are being archived.
+    """
+    uploads = MultipartUpload.objects.using(using).filter(bucket_id__in=bucket_ids)
+    for upload in list(uploads.select_related("bucket")):
+        try:
+            abort(upload)
+        except MultipartUpload.DoesNotExist:
+            pass
@@ -0,0 +1,62 @@
+"""
+Materialized-path helpers for the bucket namespace.
+
+A bucket's `prefix` is the folder it lives in, normalized to start and end
+with "/" ("/" is the root, "/team/a/" a nested folder). Every descendant of
+a folder has a prefix in [prefix, prefix-with-trailing-"/"-bumped-to-"0"),
+so subtree queries are range scans on the (organization, prefix) index
+rather than LIKE patterns, which SQLite cannot serve from a BINARY index.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db.models import Value
+from django.db.models.functions import StrIndex, Substr
+
+ROOT = "/"
+
+
+def normalize_prefix(value):
+    """
+    Turns "team/a", "/team/a" or "/team//a/" into "/team/a/".
+    """
+    if value in (None, ""):
+        return ROOT
+    segments = [segment for segment in str(value).split("/") if segment]
+    if any(segment in (".", "..") for segment in segments):
+        raise ValidationError("Path segments cannot be '.' or '..'.")
+    if not segments:
+        return ROOT
+    return ROOT + "/".join(segments) + "/"
+
+
+def prefix_upper_bound(prefix):
+    # "/" sorts immediately before "0", so "/team/a0" bounds "/team/a/...".
+    return prefix[:-1] + "0"
+
+
+def in_subtree(queryset, prefix):
+    """
+    Rows whose prefix is `prefix` or any folder below it.
+    """
+    return queryset.filter(prefix__gte=prefix, prefix__lt=prefix_upper_bound(prefix))
+
+
+def child_folders(queryset, prefix, after="", limit=None):
+    """
+    Names of the direct sub-folders of `prefix`, in order, whose name plus
+    "/" sorts after `after`; at most `limit` of them. One grouped query:
+    each row below `prefix` is cut down to its first segment there.
+    """
+    start = len(prefix) + 1
+    segment = Substr("prefix", start, StrIndex(Substr("prefix", start), Value("/")))
+    folders = (
+        queryset.filter(prefix__gt=prefix, prefix__lt=prefix_upper_bound(prefix))
+        .annotate(folder=segment)
+        .filter(folder__gt=after)
+        .order_by("folder")
+        .values_list("folder", flat=True)
+        .distinct()
+    )
+    if limit is not None:
+        folders = folders[:limit]
+    return [folder[:-1] for folder in folders]
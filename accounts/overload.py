@@ -0,0 +1,184 @@
+"""
+Graceful degradation when the database is overloaded.
+
+Every query made while handling a request goes through the circuit
+breaker of its database alias (see DatabaseCircuitMiddleware). After
+`failure_threshold` consecutive transient OperationalErrors, such as
+"database is locked", a lock or statement timeout or a lost connection,
+the circuit opens and queries on that alias fail at once with a 503
+instead of waiting for their own timeouts. Other errors, such as a
+missing table, are raised unchanged and do not count. After
+`reset_timeout` seconds one request is let through as a probe: success
+closes the circuit, failure keeps it open for another period.
+
+Independently, LoadSheddingMiddleware turns requests away with a 503
+while ACCOUNTS_MAX_IN_FLIGHT requests are already admitted by the
+process, so a slow database cannot build an unbounded queue.
+"""
+
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+# SQLSTATE classes and codes (PostgreSQL), error numbers (MySQL) and
+# message fragments (SQLite and the rest) of errors that say the database
+# is busy or unreachable rather than that the query is wrong
+TRANSIENT_SQLSTATES = ("08", "53", "57P", "55P03", "57014")
+TRANSIENT_MYSQL_ERRORS = {1040, 1205, 2002, 2003, 2006, 2013}
+TRANSIENT_MESSAGES = (
+    "database is locked",
+    "database table is locked",
+    "busy",
+    "connection",
+    "server closed",
+    "timeout",
+)
+
+
+def is_transient(exc):
+    error = exc.__cause__ or exc
+    sqlstate = getattr(error, "sqlstate", None) or getattr(error, "pgcode", None)
+    if sqlstate:
+        return sqlstate.startswith(TRANSIENT_SQLSTATES)
+    if error.args and isinstance(error.args[0], int):
+        return error.args[0] in TRANSIENT_MYSQL_ERRORS
+    message = str(error).lower()
+    return any(fragment in message for fragment in TRANSIENT_MESSAGES)
+
+
+class DatabaseUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The database is temporarily unavailable, try again later."
+    default_code = "database_unavailable"
+
+    def __init__(self, wait):
+        super().__init__()
+        # Sent as Retry-After by the exception handler
+        self.wait = wait
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+
+    def retry_after(self):
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        return max(1, math.ceil(remaining))
+
+    def before_call(self):
+        """
+        Raises DatabaseUnavailable unless the call may go ahead.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if now >= self.opened_at + self.reset_timeout:
+                # Let this call through as the probe; another one follows
+                # after reset_timeout if it never reports back
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return
+            self.rejected += 1
+            wait = self.retry_after()
+        raise DatabaseUnavailable(wait)
+
+    def succeeded(self):
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+
+    def failed(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(alias):
+    breaker = _breakers.get(alias)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(
+                alias, CircuitBreaker(**settings.ACCOUNTS_DB_CIRCUIT_BREAKER)
+            )
+    return breaker
+
+
+def breaker_stats():
+    return {alias: breaker.stats() for alias, breaker in sorted(_breakers.items())}
+
+
+def guard_queries(alias):
+    """
+    A connection.execute_wrapper() running queries through the alias's
+    circuit breaker.
+    """
+    breaker = get_breaker(alias)
+
+    def wrapper(execute, sql, params, many, context):
+        breaker.before_call()
+        try:
+            result = execute(sql, params, many, context)
+        except OperationalError as exc:
+            if not is_transient(exc):
+                # The database answered; the query itself is at fault
+                breaker.succeeded()
+                raise
+            breaker.failed()
+            raise DatabaseUnavailable(breaker.retry_after()) from exc
+        breaker.succeeded()
+        return result
+
+    return wrapper
+
+
+class InFlightLimiter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.shed = 0
+
+    def acquire(self, limit):
+        with self._lock:
+            if limit is not None and self.in_flight >= limit:
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "shed": self.shed}
+
+
+requests_in_flight = InFlightLimiter()
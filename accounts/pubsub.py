@@ -0,0 +1,132 @@
+"""
+Publish/subscribe for push notifications.
+
+Publishers are ordinary synchronous Django code; subscribers are ASGI
+connections waiting on an event loop. InProcessBroker fans messages out to
+the subscribers of its own process, which covers a single ASGI process
+serving both the writes and the push endpoints. Deployments with several
+processes set ACCOUNTS_PUSH_BROKER to a broker backed by shared
+infrastructure implementing the same interface.
+"""
+
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Sent in place of a backlog that was dropped; clients should refetch
+RESYNC = {"event": "resync"}
+
+
+class Subscription:
+    """
+    A bounded queue of messages for one subscriber. A subscriber that falls
+    `maxsize` messages behind loses its backlog and receives a single
+    RESYNC instead, so a slow client never blocks publishers or grows
+    memory.
+    """
+
+    def __init__(self, broker, topic, maxsize, loop):
+        self.broker = broker
+        self.topic = topic
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def deliver(self, message):
+        # Runs on the subscriber's event loop
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker(ABC):
+    @abstractmethod
+    def subscribe(self, topic, maxsize):
+        """
+        Returns a Subscription bound to the running event loop.
+        """
+
+    @abstractmethod
+    def unsubscribe(self, subscription):
+        """
+        Stops delivering messages to a subscription.
+        """
+
+    @abstractmethod
+    def publish(self, topic, message):
+        """
+        Sends a JSON-serializable message to the topic's subscribers.
+        Thread-safe and non-blocking.
+        """
+
+    def stats(self):
+        return {}
+
+
+class InProcessBroker(Broker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topics = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, topic, maxsize):
+        subscription = Subscription(self, topic, maxsize, asyncio.get_running_loop())
+        with self._lock:
+            self._topics[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def publish(self, topic, message):
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+            self.published += 1
+            self.delivered += len(subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # The subscriber's event loop has shut down
+                self.unsubscribe(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "topics": len(self._topics),
+                "subscribers": sum(len(s) for s in self._topics.values()),
+                "published": self.published,
+                "delivered": self.delivered,
+            }
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.ACCOUNTS_PUSH_BROKER)()
+    return _broker
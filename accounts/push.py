@@ -0,0 +1,252 @@
+"""
+Push notifications of organization changes over ASGI.
+
+Members of an organization subscribe at /accounts/organizations/<id>/events/
+either with a GET, answered as server-sent events, or with a WebSocket,
+which receives the same messages as JSON text frames (browsers cannot set
+headers on WebSockets, so the JWT or API key may also be passed as
+?token=). Views publish membership, bucket and organization changes once
+their transaction commits. PushApplication wraps the Django ASGI
+application in core/asgi.py and serves these paths itself, so a
+long-lived subscriber costs a coroutine rather than a worker thread.
+
+A subscription ends as soon as its member is removed or the organization
+is deleted, and membership is re-checked against the database every
+RECHECK_SECONDS in case the change was made without an event.
+"""
+
+import asyncio
+import json
+import re
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpRequest
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+
+from .models import Organization, User
+from .pubsub import get_broker
+
+EVENTS_PATH = re.compile(r"^/accounts/organizations/(?P<org_id>\d+)/events/$")
+HEARTBEAT_SECONDS = 15
+RECHECK_SECONDS = 60
+
+
+def topic(organization_id):
+    return f"organization:{organization_id}"
+
+
+def publish(organization_id, event, **data):
+    """
+    Notifies the organization's subscribers after the current transaction
+    commits (immediately outside one).
+    """
+    message = {"event": event, "organization": organization_id, **data}
+    transaction.on_commit(lambda: get_broker().publish(topic(organization_id), message))
+
+
+def encode(message):
+    return json.dumps(message, cls=DjangoJSONEncoder)
+
+
+def authorize(headers, organization_id, token=None):
+    """
+    Authenticates the connection with the API's authentication classes
+    and returns (HTTP status, user): 200 for a member of a live
+    organization.
+    """
+    request = HttpRequest()
+    for name, value in headers:
+        key = name.decode("latin1").upper().replace("-", "_")
+        request.META[f"HTTP_{key}"] = value.decode("latin1")
+    if token and "HTTP_AUTHORIZATION" not in request.META:
+        # JWTs have three dot-separated parts, API keys two
+        keyword = "Bearer" if token.count(".") == 2 else "Api-Key"
+        request.META["HTTP_AUTHORIZATION"] = f"{keyword} {token}"
+
+    user = None
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(request)
+        except AuthenticationFailed:
+            return 401, None
+        if result is not None:
+            user = result[0]
+            break
+
+    if user is None:
+        return 401, None
+    if user.organization_id != organization_id:
+        return 403, user
+    if not Organization.objects.filter(pk=organization_id, deleted_at__isnull=True).exists():
+        return 404, user
+    return 200, user
+
+
+def is_member(user_id, organization_id):
+    return User.objects.filter(
+        pk=user_id,
+        is_active=True,
+        organization_id=organization_id,
+        organization__deleted_at__isnull=True,
+    ).exists()
+
+
+class MembershipCheck:
+    """
+    Whether a subscriber may keep listening after each message (or
+    heartbeat, None): not after its own member.removed event or an
+    organization.deleted event, nor once the database says otherwise.
+    """
+
+    def __init__(self, user_id, organization_id):
+        self.user_id = user_id
+        self.organization_id = organization_id
+        self.checked_at = time.monotonic()
+
+    async def allows(self, message):
+        if message is not None:
+            event = message.get("event")
+            if event == "organization.deleted":
+                return False
+            if event == "member.removed" and message.get("user_id") == self.user_id:
+                return False
+        if time.monotonic() - self.checked_at < RECHECK_SECONDS:
+            return True
+        self.checked_at = time.monotonic()
+        return await sync_to_async(is_member)(self.user_id, self.organization_id)
+
+
+class PushApplication:
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+
+        match = EVENTS_PATH.match(scope.get("path", ""))
+        if scope["type"] == "websocket":
+            if match is None:
+                await receive()
+                return await send({"type": "websocket.close", "code": 4404})
+            return await self.websocket(scope, receive, send, int(match["org_id"]))
+        if match is None:
+            return await self.application(scope, receive, send)
+        return await self.event_stream(scope, receive, send, int(match["org_id"]))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                return await send({"type": "lifespan.shutdown.complete"})
+
+    async def respond(self, send, status, detail):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": encode({"detail": detail}).encode()})
+
+    async def event_stream(self, scope, receive, send, organization_id):
+        if scope["method"] != "GET":
+            return await self.respond(send, 405, "Method not allowed.")
+        status, user = await sync_to_async(authorize)(scope["headers"], organization_id)
+        if status != 200:
+            return await self.respond(send, status, "Not allowed to subscribe.")
+        membership = MembershipCheck(user.pk, organization_id)
+
+        subscription = get_broker().subscribe(
+            topic(organization_id), settings.ACCOUNTS_PUSH_QUEUE_SIZE
+        )
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": b"retry: 3000\n\n", "more_body": True})
+
+            while True:
+                message = await self.next_message(subscription, disconnected)
+                if message is False:
+                    break
+                if message is None:
+                    chunk = ": keepalive\n\n"
+                else:
+                    chunk = f"event: {message['event']}\ndata: {encode(message)}\n\n"
+                allowed = await membership.allows(message)
+                await send(
+                    {"type": "http.response.body", "body": chunk.encode(), "more_body": allowed}
+                )
+                if not allowed:
+                    break
+        finally:
+            subscription.close()
+            disconnected.cancel()
+
+    async def websocket(self, scope, receive, send, organization_id):
+        if (await receive())["type"] != "websocket.connect":
+            return
+        token = parse_qs(scope.get("query_string", b"").decode()).get("token", [None])[0]
+        status, user = await sync_to_async(authorize)(scope["headers"], organization_id, token)
+        if status != 200:
+            return await send({"type": "websocket.close", "code": 4000 + status})
+        membership = MembershipCheck(user.pk, organization_id)
+
+        subscription = get_broker().subscribe(
+            topic(organization_id), settings.ACCOUNTS_PUSH_QUEUE_SIZE
+        )
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await send({"type": "websocket.accept"})
+            while True:
+                message = await self.next_message(subscription, disconnected)
+                if message is False:
+                    break
+                if message is not None:
+                    await send({"type": "websocket.send", "text": encode(message)})
+                if not await membership.allows(message):
+                    await send({"type": "websocket.close", "code": 4403})
+                    break
+        finally:
+            subscription.close()
+            disconnected.cancel()
+
+    async def next_message(self, subscription, disconnected):
+        """
+        The next published message, None after HEARTBEAT_SECONDS without
+        one, or False once the client has gone.
+        """
+        getter = asyncio.ensure_future(subscription.get())
+        done, _ = await asyncio.wait(
+            {getter, disconnected},
+            timeout=HEARTBEAT_SECONDS,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if getter in done:
+            return getter.result()
+        getter.cancel()
+        return False if disconnected in done else None
+
+    async def wait_for_disconnect(self, receive):
+        while True:
+            message = await receive()
+            if message["type"] in ("http.disconnect", "websocket.disconnect"):
+                return
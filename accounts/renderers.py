@@ -0,0 +1,33 @@
+import msgpack
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets views negotiate "Accept: text/event-stream"; such views return a
+    StreamingHttpResponse themselves, so nothing is rendered here.
+    """
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders "Accept: application/msgpack" (or ?format=msgpack). Values that
+    MessagePack has no type for are converted as the JSON renderer does,
+    so both formats carry the same data.
+    """
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=JSONEncoder().default)
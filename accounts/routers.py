@@ -0,0 +1,83 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from .sharding import (
+    SHARD_LOCAL_MODELS,
+    TENANT_MODELS,
+    get_shards,
+    is_tenant_model,
+    shard_for_organization,
+)
+
+
+class TenantShardRouter:
+    """
+    Routes tenant-scoped models (see sharding.TENANT_MODELS) to the shard
+    of their organization. Organizations, users and everything else stay on
+    the default database, which acts as the directory.
+    """
+
+    def _shard_from_hints(self, model, hints):
+        if not is_tenant_model(model):
+            return None
+
+        instance = hints.get("instance")
+        if instance is None:
+            return None
+
+        if instance._meta.label == "accounts.Organization":
+            return shard_for_organization(instance)
+        if is_tenant_model(type(instance)):
+            return self._shard_of(instance)
+
+        organization_id = getattr(instance, "organization_id", None)
+        if organization_id is not None:
+            return shard_for_organization(organization_id)
+        return None
+
+    def _shard_of(self, instance):
+        if instance._state.db:
+            return instance._state.db
+        # A new row: follow its organization, or the tenant row it belongs
+        # to (an object's bucket, a part's upload)
+        for field in instance._meta.concrete_fields:
+            if not field.is_relation:
+                continue
+            parent = field.get_cached_value(instance, None)
+            if field.related_model._meta.label == "accounts.Organization":
+                if parent is not None:
+                    return shard_for_organization(parent)
+                if getattr(instance, field.attname) is not None:
+                    return shard_for_organization(getattr(instance, field.attname))
+            elif is_tenant_model(field.related_model) and parent is not None:
+                if parent._state.db:
+                    return parent._state.db
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._shard_from_hints(model, hints)
+
+    def db_for_write(self, model, **hints):
+        shard = self._shard_from_hints(model, hints)
+        if shard is None and hints.get("instance") is not None and len(get_shards()) > 1:
+            if is_tenant_model(model) and is_tenant_model(type(hints["instance"])):
+                raise ValueError(
+                    f"No shard for this {model._meta.label}: give it its organization "
+                    "or parent row, or write it through for_organization() or using()."
+                )
+        return shard
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Tenant rows reference organizations and users in the directory.
+        if is_tenant_model(type(obj1)) or is_tenant_model(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS:
+            return None
+        if app_label != "accounts" or model_name is None:
+            return False
+        label = f"{app_label}.{model_name}"
+        return any(
+            label == model.lower() for model in [*TENANT_MODELS, *SHARD_LOCAL_MODELS]
+        )
@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from accounts.models import Organization, User
+from accounts.models import Organization, User, Object, BucketGrant, ApiKey, ChangeEvent
+from accounts import signup
 
 User = get_user_model()
 
@@ -12,17 +15,45 @@ class SignupSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["username", "email", "password"]
+        # Uniqueness of both is checked together by validate()
+        extra_kwargs = {
+            "username": {"validators": [UnicodeUsernameValidator()]},
+            "email": {"validators": []},
+        }
 
     def validate_password(self, value):
         validate_password(value)
         return value
 
+    def validate_email(self, value):
+        return signup.normalize_email(value)
+
+    def validate(self, attrs):
+        self.check_available(attrs)
+        return attrs
+
+    def check_available(self, attrs, precheck=True):
+        taken = signup.taken(attrs["username"], attrs["email"], precheck=precheck)
+        errors = {}
+        if "username" in taken:
+            errors["username"] = ["A user with that username already exists."]
+        if "email" in taken:
+            errors["email"] = ["user with this email already exists."]
+        if errors:
+            raise serializers.ValidationError(errors)
+
     def create(self, validated_data):
-        return User.objects.create_user(
-            username=validated_data["username"],
-            email=validated_data["email"],
-            password=validated_data["password"],
-        )
+        try:
+            with transaction.atomic():
+                return User.objects.create_user(
+                    username=validated_data["username"],
+                    email=validated_data["email"],
+                    password=validated_data["password"],
+                )
+        except IntegrityError:
+            # Taken concurrently, or unknown to this process's Bloom filter
+            self.check_available(validated_data, precheck=False)
+            raise
 
 
 class LoginSerializer(serializers.Serializer):
@@ -30,8 +61,40 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Renders only the fields named in the `fields` context entry (from
+    ?fields=) when one is given. `query_paths()` maps those fields to the
+    ORM lookups they read, for QuerySet.only(); `field_paths` overrides
+    the mapping for computed fields, and fields with no paths (reverse
+    relations) are not loaded unless requested.
+    """
+    field_paths = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested is not None:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+    @classmethod
+    def query_paths(cls, names):
+        model = cls.Meta.model
+        columns = {f.name: f.name for f in model._meta.concrete_fields}
+        columns.update({f.attname: f.name for f in model._meta.concrete_fields})
+        paths = []
+        for name in names:
+            if name in cls.field_paths:
+                paths.extend(cls.field_paths[name])
+            elif name in columns:
+                paths.append(columns[name])
+        return paths
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     organization_name = serializers.SerializerMethodField()
+    field_paths = {'organization_name': ['organization', 'organization__name']}
 
     def get_organization_name(self, obj):
         return obj.organization.name if obj.organization else None
@@ -46,15 +109,65 @@ class OrganizationMemberSerializer(serializers.ModelSerializer):
         fields = ["id", "email", "name"]
 
 
-class OrganizationSerializer(serializers.ModelSerializer):
+class OrganizationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     members = OrganizationMemberSerializer(many=True, read_only=True)
     class Meta:
         model = Organization
-        fields = ['id', 'name', 'description', 'manager', 'members','created_at', 'updated_at']
+        fields = ['id', 'name', 'description', 'manager', 'members', 'storage_quota',
+                  'storage_used', 'created_at', 'updated_at']
+        read_only_fields = ['storage_quota', 'storage_used']
+
+
+class ObjectSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(min_value=0, required=False)
+
+    class Meta:
+        model = Object
+        fields = ['key', 'size', 'checksum', 'content_type', 'updated_at']
+        read_only_fields = ['updated_at']
+
+
+class BucketGrantSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BucketGrant
+        fields = ['id', 'user', 'group', 'can_read', 'can_write', 'can_execute',
+                  'created_at', 'updated_at']
+        # Uniqueness is per principal and enforced by the upsert in the view
+        validators = []
+
+    def validate(self, attrs):
+        user, group = attrs.get("user"), attrs.get("group")
+        if (user is None) == (group is None):
+            raise serializers.ValidationError("Grant to exactly one of 'user' or 'group'.")
+        bucket = self.context["bucket"]
+        if user is not None and user.organization_id != bucket.organization_id:
+            raise serializers.ValidationError(
+                {"user": "User is not a member of this organization."}
+            )
+        return attrs
+
+
+class ApiKeySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ApiKey
+        fields = ['id', 'name', 'prefix', 'user', 'created_at']
 
 
+class ChangeEventSerializer(serializers.ModelSerializer):
+    seq = serializers.IntegerField(source='id', read_only=True)
 
+    class Meta:
+        model = ChangeEvent
+        fields = ['seq', 'model', 'object_id', 'organization', 'operation', 'data', 'created_at']
 
 
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+    path = serializers.CharField(max_length=2048)
+    body = serializers.JSONField(required=False, default=None)
+    headers = serializers.DictField(child=serializers.CharField(), required=False, default=dict)
 
 
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(child=SubRequestSerializer(), min_length=1, max_length=25)
+    atomic = serializers.BooleanField(default=False)
@@ -0,0 +1,148 @@
+import zlib
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F, Max
+from django.db.models.fields import AutoFieldMixin
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+# Tenant-scoped models stored on the organization's shard, mapped to the
+# lookup selecting one organization's rows. Parents come first so rows can
+# be copied between shards in this order.
+TENANT_MODELS = {
+    "accounts.Bucket": "organization",
+    "accounts.BucketGrant": "organization",
+    "accounts.Object": "bucket__organization",
+    "accounts.MultipartUpload": "bucket__organization",
+    "accounts.UploadPart": "upload__bucket__organization",
+    "accounts.BucketArchive": "organization",
+}
+
+# Models created on every database whose rows stay where they were
+# written, such as the change feed outbox.
+SHARD_LOCAL_MODELS = {"accounts.ChangeEvent", "accounts.IdSequence"}
+
+# Each shard hands out the primary keys of new tenant rows from its own
+# range of this many ids, by position in ACCOUNTS_SHARDS, so rows keep their
+# ids when they are moved to another shard
+SHARD_ID_SPAN = 2**48
+
+# Seconds a client is asked to wait before retrying a write refused while
+# its organization is being moved
+MOVE_RETRY_AFTER = 30
+
+
+class OrganizationMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "This organization is being moved, try again later."
+    default_code = "organization_moving"
+    # Sent as Retry-After by the exception handler
+    wait = MOVE_RETRY_AFTER
+
+
+def get_shards():
+    return settings.ACCOUNTS_SHARDS
+
+
+def get_tenant_models():
+    return [apps.get_model(label) for label in TENANT_MODELS]
+
+
+def tenant_rows(model, organization_id, using):
+    """
+    All rows of a tenant model belonging to one organization on a shard.
+    """
+    lookup = TENANT_MODELS[model._meta.label]
+    return model._base_manager.using(using).filter(**{lookup: organization_id})
+
+
+def is_tenant_model(model):
+    return model._meta.label in TENANT_MODELS
+
+
+def allocate_ids(model, using, count=1):
+    """
+    Reserves `count` primary keys for new rows of a tenant model on shard
+    `using`, from that shard's range. Returns None where the database's own
+    autoincrement is used: with a single database, or for models whose keys
+    are not integers from a sequence.
+
+    The reservation is a row update on the same shard, so it commits or
+    rolls back with the rows that use the ids.
+    """
+    shards = get_shards()
+    if len(shards) == 1 or not count or not isinstance(model._meta.pk, AutoFieldMixin):
+        return None
+
+    IdSequence = apps.get_model("accounts", "IdSequence")
+    sequences = IdSequence.objects.using(using).filter(name=model._meta.label)
+    with transaction.atomic(using=using):
+        if not sequences.update(next_id=F("next_id") + count):
+            try:
+                with transaction.atomic(using=using):
+                    IdSequence.objects.using(using).create(
+                        name=model._meta.label, next_id=first_free_id(model, using) + count
+                    )
+            except IntegrityError:
+                # Created by a concurrent first allocation
+                sequences.update(next_id=F("next_id") + count)
+        next_id = sequences.values_list("next_id", flat=True).get()
+    return list(range(next_id - count, next_id))
+
+
+def first_free_id(model, using):
+    # Rows written before ids were allocated may already use part of the
+    # range
+    start = get_shards().index(using) * SHARD_ID_SPAN
+    last = (
+        model._base_manager.using(using)
+        .filter(pk__gte=start, pk__lt=start + SHARD_ID_SPAN)
+        .aggregate(last=Max("pk"))["last"]
+    )
+    return max(start, last or 0) + 1
+
+
+def pick_shard(organization):
+    """
+    Chooses a shard for a new organization from a stable hash of its name.
+    """
+    shards = get_shards()
+    if len(shards) == 1:
+        return shards[0]
+    return shards[zlib.crc32(organization.name.encode()) % len(shards)]
+
+
+def shard_for_organization(organization):
+    """
+    Returns the database alias holding the tenant data of an organization,
+    given either an Organization instance or its id. Ids are looked up in
+    the directory every time instead of being cached per process, so every
+    worker sees a move as soon as it is switched.
+    """
+    shards = get_shards()
+    if len(shards) == 1 or organization is None:
+        return DEFAULT_DB_ALIAS
+
+    if isinstance(organization, apps.get_model("accounts", "Organization")):
+        return organization.shard or DEFAULT_DB_ALIAS
+
+    Organization = apps.get_model("accounts", "Organization")
+    return (
+        Organization.objects.using(DEFAULT_DB_ALIAS)
+        .filter(pk=organization)
+        .values_list("shard", flat=True)
+        .first()
+    ) or DEFAULT_DB_ALIAS
+
+
+def check_writable(organization):
+    """
+    Raises OrganizationMoving while move_organization is copying the
+    organization's tenant data, so nothing is written to the source shard
+    after it has been copied.
+    """
+    if organization.moving_since is not None:
+        raise OrganizationMoving()
@@ -0,0 +1,181 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from . import acl, changefeed, signup, suggestions
+from .sharding import allocate_ids, is_tenant_model
+from .models import Bucket, BucketGrant, Organization, User
+
+
+MANAGER_MEMBERSHIP_MESSAGE = "Manager must be a member of this organization."
+
+# Trigger statements per database vendor, mirroring Organization.clean():
+# a new organization may be created with a manager that has no organization
+# yet, otherwise the manager must be a member. They are (re)installed after
+# every migrate because SQLite drops triggers whenever a migration rebuilds
+# the organizations table.
+MANAGER_MEMBERSHIP_TRIGGERS = {
+    "sqlite": [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS organizations_manager_membership_insert
+        BEFORE INSERT ON organizations
+        FOR EACH ROW
+        WHEN NEW.manager_id IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM users
+            WHERE id = NEW.manager_id
+            AND (organization_id IS NULL OR organization_id = NEW.id)
+        )
+        BEGIN
+            SELECT RAISE(ABORT, '{MANAGER_MEMBERSHIP_MESSAGE}');
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS organizations_manager_membership_update
+        BEFORE UPDATE OF manager_id ON organizations
+        FOR EACH ROW
+        WHEN NEW.manager_id IS NOT NULL
+            AND NEW.manager_id IS NOT OLD.manager_id
+            AND NOT EXISTS (
+                SELECT 1 FROM users
+                WHERE id = NEW.manager_id AND organization_id = NEW.id
+            )
+        BEGIN
+            SELECT RAISE(ABORT, '{MANAGER_MEMBERSHIP_MESSAGE}');
+        END
+        """,
+    ],
+    "postgresql": [
+        f"""
+        CREATE OR REPLACE FUNCTION organizations_manager_membership()
+        RETURNS trigger AS $$
+        BEGIN
+            IF NEW.manager_id IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM users
+                WHERE id = NEW.manager_id
+                AND (
+                    organization_id = NEW.id
+                    OR (TG_OP = 'INSERT' AND organization_id IS NULL)
+                )
+            ) THEN
+                RAISE EXCEPTION '{MANAGER_MEMBERSHIP_MESSAGE}'
+                    USING ERRCODE = 'integrity_constraint_violation';
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS organizations_manager_membership ON organizations",
+        """
+        CREATE TRIGGER organizations_manager_membership
+        BEFORE INSERT OR UPDATE OF manager_id ON organizations
+        FOR EACH ROW
+        WHEN (NEW.manager_id IS NOT NULL)
+        EXECUTE FUNCTION organizations_manager_membership()
+        """,
+    ],
+}
+
+
+@receiver(post_migrate)
+def install_manager_membership_trigger(sender, using="default", **kwargs):
+    """
+    Installs the optional database trigger enforcing that an organization's
+    manager is one of its members. Enabled with
+    ACCOUNTS_MANAGER_MEMBERSHIP_TRIGGER; Organization.save() then skips its
+    own membership query, so it is an error to enable it on a database
+    without a trigger definition.
+    """
+    if sender.name != "accounts" or not settings.ACCOUNTS_MANAGER_MEMBERSHIP_TRIGGER:
+        return
+
+    connection = connections[using]
+    statements = MANAGER_MEMBERSHIP_TRIGGERS.get(connection.vendor)
+    if statements is None:
+        raise ImproperlyConfigured(
+            "ACCOUNTS_MANAGER_MEMBERSHIP_TRIGGER is not supported on "
+            f"{connection.vendor} (database {using!r}); supported vendors are "
+            f"{', '.join(sorted(MANAGER_MEMBERSHIP_TRIGGERS))}."
+        )
+
+    with connection.cursor() as cursor:
+        table_names = connection.introspection.table_names(cursor)
+        if "organizations" not in table_names or "users" not in table_names:
+            return
+        for statement in statements:
+            cursor.execute(statement)
+
+
+@receiver(pre_save)
+def allocate_tenant_id(sender, instance, raw, using, **kwargs):
+    # bulk_create sends no signal; TenantQuerySet.bulk_create allocates
+    if instance.pk is None and not raw and is_tenant_model(sender):
+        ids = allocate_ids(sender, using)
+        if ids is not None:
+            instance.pk = ids[0]
+
+
+@receiver(post_save, sender=BucketGrant)
+@receiver(post_delete, sender=BucketGrant)
+def invalidate_grant_index(sender, instance, using, **kwargs):
+    acl.invalidate(instance.organization_id, using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_index(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """
+    Group membership feeds the permission index of the users involved,
+    whichever side of the relation was changed. Clearing a group's members
+    reports no pk_set, so their organizations are noted before the clear
+    and invalidated once it is done.
+    """
+    if action == "pre_clear" and reverse:
+        instance._cleared_organizations = set(
+            instance.user_set.values_list("organization_id", flat=True)
+        )
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        acl.invalidate(instance.organization_id, using)
+        return
+
+    if action == "post_clear":
+        organization_ids = instance.__dict__.pop("_cleared_organizations", set())
+    else:
+        organization_ids = set(
+            User.objects.filter(pk__in=pk_set).values_list("organization_id", flat=True)
+        )
+    for organization_id in organization_ids:
+        acl.invalidate(organization_id, using)
+
+
+@receiver(post_save, sender=User)
+def remember_taken_names(sender, instance, **kwargs):
+    signup.remember(instance.username, instance.email)
+    suggestions.remember(instance.username)
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Bucket)
+def record_saved_change(sender, instance, created, using, update_fields, **kwargs):
+    changefeed.record(
+        sender,
+        instance.pk,
+        changefeed.organization_of(instance),
+        "created" if created else "updated",
+        using,
+        changefeed.snapshot(instance, update_fields),
+    )
+
+
+@receiver(post_delete, sender=Organization)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Bucket)
+def record_deleted_change(sender, instance, using, **kwargs):
+    # Sent inside the deletion's transaction, including queryset deletes
+    operation, data = changefeed.deletion()
+    changefeed.record(
+        sender, instance.pk, changefeed.organization_of(instance), operation, using, data
+    )
@@ -0,0 +1,110 @@
+"""
+Username and email availability for signup.
+
+Emails are unique case-insensitively (the unique_user_email_ci index on
+LOWER(email)), and both names are checked with one query that uses the
+username and LOWER(email) indexes. When ACCOUNTS_SIGNUP_BLOOM_FILTER is
+set, each process also keeps a Bloom filter of taken names: a name it has
+never seen is certainly free as far as this process knows, so the query
+is skipped. Names taken by other processes since the filter was built are
+caught by the unique constraints when the user is inserted.
+"""
+
+import hashlib
+import math
+import threading
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
+
+from .models import User
+
+
+class BloomFilter:
+    """
+    A set that answers "maybe present" or "certainly absent", sized for
+    `capacity` entries at the given false positive rate.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        with self._lock:
+            for position in self._positions(value):
+                self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+_taken = None
+_taken_lock = threading.Lock()
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def taken_names():
+    """
+    The process's Bloom filter of taken usernames and emails, built from
+    the users table on first use; None when the pre-check is disabled.
+    """
+    global _taken
+    options = settings.ACCOUNTS_SIGNUP_BLOOM_FILTER
+    if options is None:
+        return None
+    if _taken is None:
+        with _taken_lock:
+            if _taken is None:
+                names = BloomFilter(**options)
+                users = User.objects.values_list("username", "email")
+                for username, email in users.iterator(chunk_size=5000):
+                    names.add(f"u:{username}")
+                    names.add(f"e:{normalize_email(email)}")
+                _taken = names
+    return _taken
+
+
+def remember(username, email):
+    if _taken is not None:
+        _taken.add(f"u:{username}")
+        _taken.add(f"e:{normalize_email(email)}")
+
+
+def taken(username, email, precheck=True):
+    """
+    Returns which of "username" and "email" are already in use, with at
+    most one query. `precheck=False` skips the Bloom filter.
+    """
+    email = normalize_email(email)
+    names = taken_names() if precheck else None
+    if names is not None and f"u:{username}" not in names and f"e:{email}" not in names:
+        return set()
+
+    rows = (
+        User.objects.filter(Q(username=username) | Q(Exact(Lower("email"), email)))
+        .values_list("username", "email")[:2]
+    )
+    result = set()
+    for existing_username, existing_email in rows:
+        if existing_username == username:
+            result.add("username")
+        if normalize_email(existing_email) == email:
+            result.add("email")
+    return result
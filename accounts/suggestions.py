@@ -0,0 +1,188 @@
+"""
+Available username suggestions for signup.
+
+Taken usernames are kept per process in a trie, so checking a candidate
+and finding the numbered variants already in use ("jane.doe", "jane.doe1",
+...) are walks down one branch rather than queries. The trie is built on
+first use and then refreshed incrementally: users saved in this process
+are added as they are saved, and users created elsewhere are loaded by id
+every ACCOUNTS_USERNAME_INDEX_REFRESH seconds. Suggestions are confirmed
+with a single query before they are returned, so a stale index can only
+cost a suggestion, never offer a taken name.
+
+Usernames are case-sensitive, as they are for signup and login, so a
+requested username keeps its case; only the handles built from first and
+last names are lowercased.
+"""
+
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from .models import User
+
+MAX_SUGGESTIONS = 20
+
+# Leaf marker; usernames never contain the empty string as a character
+END = ""
+
+DISALLOWED = re.compile(r"[^\w.@+-]")
+
+
+class Trie:
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    def add(self, word):
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        if END not in node:
+            node[END] = True
+            self.size += 1
+
+    def find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, word):
+        node = self.find(word)
+        return node is not None and END in node
+
+    def numbered(self, base):
+        """
+        The numbers n for which base + str(n) is in the trie.
+        """
+        numbers = set()
+        stack = [(self.find(base), "")]
+        while stack:
+            node, digits = stack.pop()
+            if node is None:
+                continue
+            if digits and END in node:
+                numbers.add(int(digits))
+            stack.extend(
+                (child, digits + char)
+                for char, child in node.items()
+                if char != END and char.isdigit()
+            )
+        return numbers
+
+
+class UsernameIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.trie = Trie()
+        self.last_id = 0
+        self.refreshed_at = None
+
+    def add(self, username):
+        with self._lock:
+            self.trie.add(username)
+
+    def refresh(self):
+        """
+        Adds the users created since the last refresh.
+        """
+        with self._lock:
+            users = User.objects.filter(pk__gt=self.last_id).order_by("pk")
+            for pk, username in users.values_list("pk", "username").iterator(chunk_size=5000):
+                self.trie.add(username)
+                self.last_id = pk
+            self.refreshed_at = time.monotonic()
+
+    def is_stale(self):
+        return (
+            self.refreshed_at is None
+            or time.monotonic() - self.refreshed_at >= settings.ACCOUNTS_USERNAME_INDEX_REFRESH
+        )
+
+    def __contains__(self, username):
+        return username in self.trie
+
+    def numbered(self, base):
+        return self.trie.numbered(base)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = UsernameIndex()
+    if _index.is_stale():
+        _index.refresh()
+    return _index
+
+
+def remember(username):
+    if _index is not None:
+        _index.add(username)
+
+
+def clean(value):
+    return DISALLOWED.sub("", value.strip().replace(" ", "."))
+
+
+def base_names(first_name="", last_name="", username=""):
+    """
+    Candidate handles in order of preference, "first.last" style first.
+    """
+    first, last = clean(first_name).lower(), clean(last_name).lower()
+    names = [clean(username)]
+    if first and last:
+        names += [
+            f"{first}.{last}",
+            f"{first}{last}",
+            f"{first}_{last}",
+            f"{first[0]}.{last}",
+            f"{last}.{first}",
+        ]
+    else:
+        names.append(first or last)
+    max_length = User._meta.get_field("username").max_length
+    unique = []
+    for name in names:
+        name = name[:max_length - 4]
+        if name and name not in unique:
+            unique.append(name)
+    return unique
+
+
+def suggest(first_name="", last_name="", username="", count=5):
+    """
+    Up to `count` usernames that are not taken: free base names first,
+    then the lowest free numbered variants of the preferred one.
+    """
+    bases = base_names(first_name, last_name, username)
+    if not bases:
+        return []
+    index = get_index()
+
+    candidates = [name for name in bases if name not in index]
+    preferred = bases[0]
+    used = index.numbered(preferred)
+    number = 1
+    while len(candidates) < count * 2:
+        if number not in used:
+            candidates.append(f"{preferred}{number}")
+        number += 1
+
+    # One query to catch names the index has not seen yet
+    taken = set(
+        User.objects.filter(username__in=candidates).values_list("username", flat=True)
+    )
+    for name in taken:
+        index.add(name)
+    return [name for name in candidates if name not in taken][:count]
@@ -1,13 +1,40 @@
 from django.urls import path
-from .views import (SignupView, LoginView, OrganizationDetailWithMembersView, 
+from .views import (SignupView, LoginView, CurrentUserView,
+                   UsernameSuggestionsView, OrganizationDetailWithMembersView, 
                    AddOrRemoveUserFromOrganizationView, OrganizationUpdateView,
-                   CreateBucketView)
+                   OrganizationDeleteView, CreateBucketView, ListBucketsView,
+                   DeleteBucketView, ListObjectsView, BatchObjectsView,
+                   ObjectDataView, InitiateMultipartUploadView,
+                   MultipartUploadView, UploadPartView,
+                   CompleteMultipartUploadView, BucketGrantsView,
+                   DeleteBucketGrantView, ApiKeysView, RevokeApiKeyView,
+                   ActivityReportView, ChangesView, BatchView, MetricsView)
 
 urlpatterns = [
     path("signup/", SignupView.as_view(), name="signup"),
     path("login/", LoginView.as_view(), name="login"),
+    path("me/", CurrentUserView.as_view(), name="me"),
+    path("usernames/suggestions/", UsernameSuggestionsView.as_view(), name="username-suggestions"),
     path('organizations/<int:org_id>/details/', OrganizationDetailWithMembersView.as_view()),
     path('organizations/<int:org_id>/update/', OrganizationUpdateView.as_view()),
+    path('organizations/<int:org_id>/delete/', OrganizationDeleteView.as_view()),
     path('organizations/<int:org_id>/users/<int:user_id>/', AddOrRemoveUserFromOrganizationView.as_view()),
-    path('organizations/<int:org_id>/bucket/', CreateBucketView.as_view())
+    path('organizations/<int:org_id>/api-keys/', ApiKeysView.as_view()),
+    path('organizations/<int:org_id>/api-keys/<int:key_id>/', RevokeApiKeyView.as_view()),
+    path('organizations/<int:org_id>/bucket/', CreateBucketView.as_view()),
+    path('organizations/<int:org_id>/buckets/', ListBucketsView.as_view()),
+    path('organizations/<int:org_id>/bucket/<int:bucket_id>/', DeleteBucketView.as_view()),
+    path('organizations/<int:org_id>/reports/activity/', ActivityReportView.as_view()),
+    path('organizations/<int:org_id>/buckets/<int:bucket_id>/objects/', ListObjectsView.as_view()),
+    path('organizations/<int:org_id>/buckets/<int:bucket_id>/objects/batch/', BatchObjectsView.as_view()),
+    path('organizations/<int:org_id>/buckets/<int:bucket_id>/object/<path:key>', ObjectDataView.as_view()),
+    path('organizations/<int:org_id>/buckets/<int:bucket_id>/uploads/', InitiateMultipartUploadView.as_view()),
+    path('organizations/<int:org_id>/buckets/<int:bucket_id>/uploads/<uuid:upload_id>/', MultipartUploadView.as_view()),
+    path('organizations/<int:org_id>/buckets/<int:bucket_id>/uploads/<uuid:upload_id>/parts/<int:part_number>/', UploadPartView.as_view()),
+    path('organizations/<int:org_id>/buckets/<int:bucket_id>/uploads/<uuid:upload_id>/complete/', CompleteMultipartUploadView.as_view()),
+    path('organizations/<int:org_id>/buckets/<int:bucket_id>/grants/', BucketGrantsView.as_view()),
+    path('organizations/<int:org_id>/buckets/<int:bucket_id>/grants/<int:grant_id>/', DeleteBucketGrantView.as_view()),
+    path('changes/', ChangesView.as_view()),
+    path('batch/', BatchView.as_view()),
+    path('metrics/', MetricsView.as_view()),
 ]
@@ -0,0 +1,119 @@
+"""
+Storage usage counters and quota enforcement.
+
+Organization.storage_used and Bucket.storage_used are maintained with F()
+increments as objects are written and deleted, so checking a quota reads
+one row instead of summing every object. The organization is charged
+first with a conditional UPDATE that only succeeds while the result stays
+within its quota, which makes the check and the reservation one atomic
+statement. Organizations and buckets live in different databases, so the
+two counters cannot share a transaction; reconcile() recomputes both from
+the objects and corrects any drift.
+"""
+
+from collections import defaultdict
+
+from django.db.models import F, Q, Sum
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Bucket, Object, Organization, UploadPart
+from .sharding import get_shards
+
+
+class QuotaExceeded(APIException):
+    status_code = status.HTTP_507_INSUFFICIENT_STORAGE
+    default_detail = "Storage quota exceeded."
+    default_code = "quota_exceeded"
+
+
+def charge(bucket, delta, enforce=True):
+    """
+    Adds `delta` bytes to the usage of a bucket and its organization.
+    Raises QuotaExceeded, changing nothing, if a positive delta would take
+    the organization over its quota. `enforce=False` records bytes that
+    are already stored even past the quota.
+    """
+    if not delta:
+        return
+
+    organizations = Organization.objects.filter(pk=bucket.organization_id)
+    if delta > 0 and enforce:
+        organizations = organizations.filter(
+            Q(storage_quota__isnull=True)
+            | Q(storage_used__lte=F("storage_quota") - delta)
+        )
+    if not organizations.update(storage_used=F("storage_used") + delta):
+        raise QuotaExceeded()
+
+    Bucket.all_objects.using(bucket._state.db).filter(pk=bucket.pk).update(
+        storage_used=F("storage_used") + delta
+    )
+
+
+def release_archived(buckets):
+    """
+    Gives the usage of buckets being archived back to their organizations.
+    """
+    freed = defaultdict(int)
+    for bucket in buckets:
+        freed[bucket.organization_id] += bucket.storage_used
+    for organization_id, size in freed.items():
+        if size:
+            Organization.objects.filter(pk=organization_id).update(
+                storage_used=F("storage_used") - size
+            )
+
+
+def reconcile(batch_size=500):
+    """
+    Recomputes every bucket's usage from its objects and staged upload
+    parts, batch_size buckets at a time, then every organization's from its buckets. Returns the number
+    of counters that had drifted and were corrected.
+    """
+    corrected = 0
+    organization_totals = defaultdict(int)
+
+    for using in get_shards():
+        buckets = Bucket.all_objects.using(using).order_by("pk")
+        last_pk = 0
+        while True:
+            batch = list(
+                buckets.filter(pk__gt=last_pk)
+                .values_list("pk", "organization_id", "storage_used")[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+
+            bucket_ids = [pk for pk, _, _ in batch]
+            stored = dict(
+                Object.objects.using(using)
+                .filter(bucket_id__in=bucket_ids)
+                .values("bucket_id")
+                .annotate(total=Sum("size"))
+                .values_list("bucket_id", "total")
+            )
+            staged = dict(
+                UploadPart.objects.using(using)
+                .filter(upload__bucket_id__in=bucket_ids)
+                .values("upload__bucket_id")
+                .annotate(total=Sum("size"))
+                .values_list("upload__bucket_id", "total")
+            )
+            for pk, organization_id, used in batch:
+                total = stored.get(pk, 0) + staged.get(pk, 0)
+                organization_totals[organization_id] += total
+                if total != used:
+                    Bucket.all_objects.using(using).filter(pk=pk).update(
+                        storage_used=total
+                    )
+                    corrected += 1
+
+    organizations = Organization.objects.values_list("pk", "storage_used")
+    for pk, used in organizations.iterator():
+        total = organization_totals.get(pk, 0)
+        if total != used:
+            Organization.objects.filter(pk=pk).update(storage_used=total)
+            corrected += 1
+    return corrected
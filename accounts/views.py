@@ -1,17 +1,86 @@
+from datetime import timedelta
+
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated, IsAdminUser
+from rest_framework.generics import get_object_or_404
+from rest_framework.settings import api_settings
+from rest_framework.exceptions import APIException, NotFound, ParseError, PermissionDenied
+from rest_framework.exceptions import ValidationError as DRFValidationError
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Prefetch, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from accounts.models import Organization, User, Bucket
+from accounts.models import (
+    Organization, User, Bucket, BucketGrant, Object, MultipartUpload, ApiKey,
+)
 from .serializers import (
     SignupSerializer,
     LoginSerializer,
+    UserSerializer,
     OrganizationSerializer,
+    ObjectSerializer,
+    BucketGrantSerializer,
+    ApiKeySerializer,
+    ChangeEventSerializer,
+    BatchSerializer,
 )
 from .permissions import IsOrganizationMember, IsOrganizationManager
+from .coalescing import organization_reads, organization_snapshots
+from .overload import DatabaseUnavailable, breaker_stats, requests_in_flight
+from .audit import audit_log
+from .archival import delete_organization
+from .namespace import child_folders, in_subtree, normalize_prefix
+from .listing import MAX_KEYS, decode_token, encode_token, key_after, list_objects
+from .blobstore import get_blob_store
+from .downloads import blob_response
+from .usage import charge
+from .renderers import EventStreamRenderer
+from .sharding import check_writable, get_shards
+from . import acl, changefeed, multipart, push, rollups, suggestions
+from .pubsub import get_broker
+from .authentication import create_api_key, revoke_api_key
+from .idempotency import idempotent
+from . import batch
+
+
+class SparseFieldsViewMixin:
+    """
+    `?fields=a,b` limits the response to those serializer fields and the
+    query to the columns they need. Unknown names are a 400.
+    """
+
+    def requested_fields(self):
+        value = self.request.query_params.get("fields")
+        if not value:
+            return None
+        names = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = sorted(set(names) - set(self.get_serializer_class().Meta.fields))
+        if unknown:
+            raise DRFValidationError({"fields": [f"Unknown fields: {', '.join(unknown)}."]})
+        return names
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.requested_fields()
+        if fields is None:
+            return queryset
+        paths = self.get_serializer_class().query_paths(fields)
+        related = {path.split("__")[0] for path in paths if "__" in path}
+        return queryset.select_related(*related).only("pk", *paths)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"] = self.requested_fields()
+        return context
 
 
 # --------------------------
@@ -19,6 +88,8 @@ from .permissions import IsOrganizationMember, IsOrganizationManager
 # --------------------------
 
 class SignupView(APIView):
+    # The response holds live tokens, so it is never stored for replay
+    @idempotent(store_response=False)
     def post(self, request):
         serializer = SignupSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -40,6 +111,52 @@ class SignupView(APIView):
         )
 
 
+class UsernameSuggestionsView(APIView):
+    """
+    Suggests free usernames from ?first_name= and ?last_name=, or from a
+    wanted ?username=, in which case `available` tells whether it is free.
+    """
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            count = min(int(params.get("count", 5)), suggestions.MAX_SUGGESTIONS)
+        except ValueError:
+            return Response(
+                {"detail": "count must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        username = params.get("username", "")
+        names = suggestions.suggest(
+            first_name=params.get("first_name", ""),
+            last_name=params.get("last_name", ""),
+            username=username,
+            count=max(count, 1),
+        )
+        if not names:
+            return Response(
+                {"detail": "Provide a username or a first and last name."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = {"suggestions": names}
+        if username:
+            data["available"] = names[0] == suggestions.clean(username)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class CurrentUserView(SparseFieldsViewMixin, generics.RetrieveAPIView):
+    serializer_class = UserSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return User.objects.all()
+
+    def get_object(self):
+        return get_object_or_404(self.get_queryset(), pk=self.request.user.pk)
+
+
 class LoginView(APIView):
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -70,76 +187,111 @@ class LoginView(APIView):
 # ORGANIZATION VIEWS
 # --------------------------
 
-class OrganizationDetailWithMembersView(generics.RetrieveAPIView):
-    queryset = Organization.objects.all()
+class CoalescedRetrieveMixin:
+    """
+    Concurrent identical GETs share one query and serialization.
+    Object permissions are still checked for every request against the
+    shared instance. While the database is unavailable the last good
+    response is served, marked stale, until the circuit breaker's probe
+    gets through again.
+    """
+    single_flight = organization_reads
+    snapshots = organization_snapshots
+
+    def retrieve(self, request, *args, **kwargs):
+        key = (self.__class__.__name__, request.get_full_path())
+        stale = False
+        try:
+            instance, data = self.single_flight.do(key, self.load_object)
+        except DatabaseUnavailable:
+            snapshot = self.snapshots.get(key)
+            if snapshot is None:
+                raise
+            instance, data = snapshot
+            stale = True
+        else:
+            self.snapshots.set(key, (instance, data))
+
+        self.check_object_permissions(request, instance)
+        response = Response(data)
+        if stale:
+            response["Warning"] = '110 - "Response is Stale"'
+        return response
+
+    def load_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        instance = get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return instance, self.get_serializer(instance).data
+
+
+class OrganizationDetailWithMembersView(
+    SparseFieldsViewMixin, CoalescedRetrieveMixin, generics.RetrieveAPIView
+):
+    queryset = Organization.objects.filter(deleted_at__isnull=True)
     serializer_class = OrganizationSerializer
     permission_classes = [IsAuthenticated, IsOrganizationMember]
     lookup_url_kwarg = "org_id"
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.requested_fields()
+        if fields is not None and "members" not in fields:
+            return queryset
+        return queryset.prefetch_related(
+            Prefetch("members", queryset=User.objects.only("id", "email", "name", "organization"))
+        )
+
 
 class OrganizationUpdateView(generics.RetrieveUpdateAPIView):
-    queryset = Organization.objects.all()
+    queryset = Organization.objects.filter(deleted_at__isnull=True)
     serializer_class = OrganizationSerializer
     permission_classes = [IsAuthenticated, IsOrganizationManager]
     lookup_url_kwarg = "org_id"
 
+    def perform_update(self, serializer):
+        org = serializer.save()
+        audit_log.record(
+            "organization.updated",
+            actor=self.request.user,
+            organization=org,
+            target=org,
+            fields=sorted(serializer.validated_data),
+        )
+        push.publish(org.id, "organization.updated", fields=sorted(serializer.validated_data))
 
-class CreateBucketView(APIView):
-    permission_classes = [IsAuthenticated, IsOrganizationManager]
-
-    def post(self, request, org_id):
-        # Validate organization
-        try:
-            org = Organization.objects.get(id=org_id)
-        except Organization.DoesNotExist:
-            return Response(
-                {"detail": "Organization not found."},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        # Enforce: requester must be org manager
-        self.check_object_permissions(request, org)
-
-        # Extract bucket name and optional endpoint from request data
-        bucket_name = request.data.get("name")
-        endpoint = request.data.get("endpoint")
-
-        if not bucket_name or not endpoint:
-            return Response(
-                {"detail": "Both 'name' and 'endpoint' are required."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
 
-        # Ensure bucket does not already exist for this organization
-        if Bucket.objects.filter(name=bucket_name, organization=org).exists():
-            return Response(
-                {"detail": "Bucket already exists for this organization."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+class OrganizationDeleteView(generics.DestroyAPIView):
+    """
+    Starts offboarding: the organization disappears immediately, while its
+    buckets are archived in small batches by the purge_buckets job.
+    """
+    queryset = Organization.objects.filter(deleted_at__isnull=True)
+    permission_classes = [IsAuthenticated, IsOrganizationManager]
+    lookup_url_kwarg = "org_id"
 
-        # Create bucket
-        bucket = Bucket.objects.create(
-            name=bucket_name,
-            endpoint=endpoint,
-            organization=org,
-            created_by=request.user
+    def destroy(self, request, *args, **kwargs):
+        org = self.get_object()
+        check_writable(org)
+        delete_organization(org)
+        audit_log.record(
+            "organization.deleted", actor=request.user, organization=org, target=org
         )
-
+        push.publish(org.id, "organization.deleted")
         return Response(
-            {
-                "detail": "Bucket created successfully.",
-                "bucket_id": bucket.id,
-                "name": bucket.name,
-                "endpoint": bucket.endpoint
-            },
-            status=status.HTTP_201_CREATED
+            {"detail": "Organization scheduled for deletion."},
+            status=status.HTTP_202_ACCEPTED,
         )
 
+
 class AddOrRemoveUserFromOrganizationView(APIView):
     permission_classes = [IsAuthenticated, IsOrganizationManager]
 
+    @idempotent
     def post(self, request, org_id, user_id):
-        org = Organization.objects.get(id=org_id)
+        org = Organization.objects.get(id=org_id, deleted_at__isnull=True)
         user = User.objects.get(id=user_id)
 
         # Enforce: requester must be the organization manager
@@ -161,6 +313,10 @@ class AddOrRemoveUserFromOrganizationView(APIView):
         
         user.organization = org
         user.save()
+        audit_log.record(
+            "member.added", actor=request.user, organization=org, target=user
+        )
+        push.publish(org.id, "member.added", user_id=user.id, username=user.username)
 
         return Response(
             {"detail":"User added successfully"},
@@ -168,7 +324,7 @@ class AddOrRemoveUserFromOrganizationView(APIView):
         )
 
     def delete(self, request, org_id, user_id):
-        org = Organization.objects.get(id=org_id)
+        org = Organization.objects.get(id=org_id, deleted_at__isnull=True)
         user = User.objects.get(id=user_id)
 
         # Enforce: requester must be the organization manager
@@ -188,6 +344,10 @@ class AddOrRemoveUserFromOrganizationView(APIView):
 
         user.organization = None
         user.save()
+        audit_log.record(
+            "member.removed", actor=request.user, organization=org, target=user
+        )
+        push.publish(org.id, "member.removed", user_id=user.id, username=user.username)
 
         return Response(
             {"detail": "User removed successfully."},
@@ -196,13 +356,79 @@ class AddOrRemoveUserFromOrganizationView(APIView):
 
 
 
+class ApiKeyMixin:
+    permission_classes = [IsAuthenticated, IsOrganizationManager]
+
+    def get_organization(self, request, org_id):
+        try:
+            org = Organization.objects.get(id=org_id, deleted_at__isnull=True)
+        except Organization.DoesNotExist:
+            raise NotFound("Organization not found.")
+        self.check_object_permissions(request, org)
+        return org
+
+
+class ApiKeysView(ApiKeyMixin, APIView):
+    """
+    Lists (GET) and issues (POST) the organization's API keys. A new key
+    acts as `user` (a member, the manager by default) and its secret is
+    only returned in the creation response.
+    """
+
+    def get(self, request, org_id):
+        org = self.get_organization(request, org_id)
+        keys = org.api_keys.filter(revoked_at__isnull=True).order_by("pk")
+        return Response(ApiKeySerializer(keys, many=True).data, status=status.HTTP_200_OK)
+
+    def post(self, request, org_id):
+        org = self.get_organization(request, org_id)
+        name = request.data.get("name")
+        if not name:
+            return Response(
+                {"detail": "Key 'name' is required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user_id = request.data.get("user", request.user.id)
+        try:
+            user = org.members.get(id=user_id)
+        except (User.DoesNotExist, ValueError, TypeError):
+            return Response(
+                {"detail": "User is not a member of this organization."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        key, token = create_api_key(org, user, name)
+        audit_log.record(
+            "api_key.created", actor=request.user, organization=org, target=key, name=name
+        )
+        return Response(
+            {**ApiKeySerializer(key).data, "key": token},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class RevokeApiKeyView(ApiKeyMixin, APIView):
+    def delete(self, request, org_id, key_id):
+        org = self.get_organization(request, org_id)
+        try:
+            key = org.api_keys.get(id=key_id, revoked_at__isnull=True)
+        except ApiKey.DoesNotExist:
+            raise NotFound("API key not found.")
+
+        revoke_api_key(key)
+        audit_log.record("api_key.revoked", actor=request.user, organization=org, target=key)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class CreateBucketView(APIView):
     permission_classes = [IsAuthenticated, IsOrganizationManager]
 
+    @idempotent
     def post(self, request, org_id):
         # Validate organization
         try:
-            org = Organization.objects.get(id=org_id)
+            org = Organization.objects.get(id=org_id, deleted_at__isnull=True)
         except Organization.DoesNotExist:
             return Response(
                 {"detail": "Organization not found."},
@@ -211,8 +437,9 @@ class CreateBucketView(APIView):
 
         # Enforce: requester must be org manager
         self.check_object_permissions(request, org)
+        check_writable(org)
 
-        # Extract bucket name from request data
+        # Extract bucket name and optional folder path from request data
         bucket_name = request.data.get("name")
         if not bucket_name:
             return Response(
@@ -220,24 +447,817 @@ class CreateBucketView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        try:
+            prefix = normalize_prefix(request.data.get("path"))
+        except ValidationError as exc:
+            return Response(
+                {"detail": exc.messages[0]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         # Ensure bucket does not already exist for this organization
-        if Bucket.objects.filter(name=bucket_name, organization=org).exists():
+        buckets = Bucket.objects.for_organization(org)
+        if buckets.filter(name=bucket_name).exists():
             return Response(
                 {"detail": "Bucket already exists for this organization."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         # Create bucket
-        bucket = Bucket.objects.create(
+        bucket = buckets.create(
             name=bucket_name,
+            prefix=prefix,
             organization=org
         )
+        audit_log.record(
+            "bucket.created",
+            actor=request.user,
+            organization=org,
+            target=bucket,
+            name=bucket.name,
+        )
+        push.publish(
+            org.id, "bucket.created", bucket_id=bucket.id, name=bucket.name, path=bucket.path
+        )
 
         return Response(
             {
                 "detail": "Bucket created successfully.",
                 "bucket_id": bucket.id,
-                "name": bucket.name
+                "name": bucket.name,
+                "path": bucket.path
             },
             status=status.HTTP_201_CREATED
-        )
\ No newline at end of file
+        )
+
+
+class ListBucketsView(APIView):
+    """
+    Lists one folder of the bucket namespace: the buckets directly in
+    `?prefix=` (default "/"), its direct sub-folders, and the number of
+    buckets in the whole subtree, each one query over the (organization,
+    prefix, name) index. Buckets and folders are paginated together like
+    object listings and their common prefixes, `max-buckets` at a time:
+    the continuation token holds the last name returned ("name/" for a
+    folder) and the next page seeks past it.
+    """
+    permission_classes = [IsAuthenticated, IsOrganizationMember]
+
+    def get(self, request, org_id):
+        try:
+            org = Organization.objects.get(id=org_id, deleted_at__isnull=True)
+        except Organization.DoesNotExist:
+            return Response(
+                {"detail": "Organization not found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        self.check_object_permissions(request, org)
+
+        params = request.query_params
+        try:
+            prefix = normalize_prefix(params.get("prefix"))
+        except ValidationError as exc:
+            return Response(
+                {"detail": exc.messages[0]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            max_buckets = min(int(params.get("max-buckets", MAX_KEYS)), MAX_KEYS)
+        except ValueError:
+            max_buckets = 0
+        if max_buckets < 1:
+            return Response(
+                {"detail": "'max-buckets' must be a positive integer."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cursor = ""
+        if params.get("continuation-token"):
+            try:
+                cursor = decode_token(params["continuation-token"])
+            except ValidationError as exc:
+                return Response(
+                    {"detail": exc.messages[0]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        # A folder sorts as its name plus "/", as its path does, so buckets
+        # and folders share one ordering, one page size and one cursor
+        buckets = Bucket.objects.for_organization(org)
+        children = (
+            buckets.filter(prefix=prefix, name__gt=cursor)
+            .order_by("name")
+            .only("id", "name", "prefix")[:max_buckets + 1]
+        )
+        folders = child_folders(buckets, prefix, after=cursor, limit=max_buckets + 1)
+        entries = sorted(
+            [(bucket.name, bucket) for bucket in children]
+            + [(name + "/", None) for name in folders],
+            key=lambda entry: entry[0],
+        )
+        is_truncated = len(entries) > max_buckets
+        entries = entries[:max_buckets]
+
+        return Response(
+            {
+                "prefix": prefix,
+                "count": in_subtree(buckets, prefix).count(),
+                "folders": [prefix + name for name, bucket in entries if bucket is None],
+                "max_buckets": max_buckets,
+                "is_truncated": is_truncated,
+                "next_continuation_token": (
+                    encode_token(entries[-1][0]) if is_truncated else None
+                ),
+                "buckets": [
+                    {"id": bucket.id, "name": bucket.name, "path": bucket.path}
+                    for name, bucket in entries
+                    if bucket is not None
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class DeleteBucketView(APIView):
+    permission_classes = [IsAuthenticated, IsOrganizationManager]
+
+    def delete(self, request, org_id, bucket_id):
+        try:
+            org = Organization.objects.get(id=org_id, deleted_at__isnull=True)
+        except Organization.DoesNotExist:
+            return Response(
+                {"detail": "Organization not found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        self.check_object_permissions(request, org)
+        check_writable(org)
+
+        try:
+            bucket = Bucket.objects.for_organization(org).get(id=bucket_id)
+        except Bucket.DoesNotExist:
+            return Response(
+                {"detail": "Bucket not found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # Soft delete; the purge_buckets job moves the row to the archive
+        bucket.deleted_at = timezone.now()
+        bucket.save(update_fields=["deleted_at", "updated_at"])
+
+        audit_log.record(
+            "bucket.deleted", actor=request.user, organization=org, target=bucket
+        )
+        push.publish(org.id, "bucket.deleted", bucket_id=bucket.id, path=bucket.path)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ActivityReportView(APIView):
+    """
+    Members joined and left and buckets created and deleted per `?period=`
+    (day or week) between `?since=` and `?until=` (ISO dates, default the
+    last 30 days), served from the daily rollups. Visible to the manager
+    and to staff.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, org_id):
+        try:
+            org = Organization.objects.get(id=org_id, deleted_at__isnull=True)
+        except Organization.DoesNotExist:
+            return Response(
+                {"detail": "Organization not found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if not request.user.is_staff and org.manager_id != request.user.id:
+            raise PermissionDenied()
+
+        params = request.query_params
+        period = params.get("period", "day")
+        since = until = None
+        try:
+            # A supplied date that does not parse is an error, not the default
+            until = parse_date(params["until"]) if "until" in params else timezone.localdate()
+            if until is not None:
+                since = parse_date(params["since"]) if "since" in params else until - timedelta(days=29)
+        except ValueError:
+            pass
+        if since is None or until is None or since > until or period not in ("day", "week"):
+            return Response(
+                {"detail": "since and until must be ISO dates in order; period is day or week."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (until - since).days >= rollups.MAX_REPORT_DAYS:
+            return Response(
+                {"detail": f"At most {rollups.MAX_REPORT_DAYS} days per report."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        series, totals = rollups.report(org.id, since, until, period)
+        return Response(
+            {
+                "period": period,
+                "since": since,
+                "until": until,
+                "series": series,
+                "totals": totals,
+                "updated_at": rollups.last_updated(),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+# --------------------------
+# OBJECT VIEWS
+# --------------------------
+
+class LengthRequired(APIException):
+    status_code = status.HTTP_411_LENGTH_REQUIRED
+    default_detail = "Content-Length is required."
+    default_code = "length_required"
+
+
+class BucketObjectsMixin:
+    permission_classes = [IsAuthenticated, IsOrganizationMember]
+    # Bucket permission (accounts.acl bits) required by each HTTP method
+    bucket_permissions = {}
+
+    def get_bucket(self, request, org_id, bucket_id, permission=None):
+        try:
+            org = Organization.objects.get(id=org_id, deleted_at__isnull=True)
+        except Organization.DoesNotExist:
+            raise NotFound("Organization not found.")
+
+        self.check_object_permissions(request, org)
+        if request.method not in SAFE_METHODS:
+            check_writable(org)
+
+        try:
+            bucket = Bucket.objects.for_organization(org).get(id=bucket_id)
+        except Bucket.DoesNotExist:
+            raise NotFound("Bucket not found.")
+
+        if permission is None:
+            permission = self.bucket_permissions[request.method]
+        granted = acl.effective_permissions(request.user, org, bucket.pk)
+        if granted & permission != permission:
+            raise PermissionDenied("You do not have access to this bucket.")
+        return bucket
+
+    def content_length(self, request):
+        """
+        The request's Content-Length, which bounds the body streamed by
+        request_chunks(), so it can be charged to the quota up front. A
+        chunked body has no size to charge and is refused with a 411.
+        """
+        if not request.META.get("CONTENT_LENGTH") and "HTTP_TRANSFER_ENCODING" in request.META:
+            raise LengthRequired
+        try:
+            size = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            size = -1
+        if size < 0:
+            raise ParseError("Content-Length must be a non-negative integer.")
+        return size
+
+    def request_chunks(self, request):
+        """
+        The request body in ACCOUNTS_UPLOAD_CHUNK_SIZE chunks, read from
+        the stream without DRF parsing or buffering it.
+        """
+        stream = request.stream
+        if stream is None:
+            return ()
+        chunk_size = settings.ACCOUNTS_UPLOAD_CHUNK_SIZE
+        return iter(lambda: stream.read(chunk_size), b"")
+
+
+class ListObjectsView(BucketObjectsMixin, APIView):
+    """
+    Lists a bucket's object keys like S3 ListObjectsV2: `prefix`,
+    `delimiter`, `max-keys`, `start-after` and `continuation-token`.
+    Pagination seeks on the (bucket, key) index, so deep pages cost the
+    same as the first one.
+    """
+    bucket_permissions = {"GET": acl.READ}
+
+    def get(self, request, org_id, bucket_id):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        params = request.query_params
+        prefix = params.get("prefix", "")
+        delimiter = params.get("delimiter", "")
+
+        try:
+            max_keys = min(int(params.get("max-keys", MAX_KEYS)), MAX_KEYS)
+        except ValueError:
+            max_keys = 0
+        if max_keys < 1:
+            return Response(
+                {"detail": "'max-keys' must be a positive integer."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cursor = ""
+        if params.get("start-after"):
+            cursor = key_after(params["start-after"])
+        if params.get("continuation-token"):
+            try:
+                cursor = decode_token(params["continuation-token"])
+            except ValidationError as exc:
+                return Response(
+                    {"detail": exc.messages[0]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        contents, common_prefixes, next_cursor = list_objects(
+            bucket.contents.only("bucket", *ObjectSerializer.Meta.fields),
+            prefix=prefix,
+            delimiter=delimiter,
+            cursor=cursor,
+            max_keys=max_keys,
+        )
+
+        return Response(
+            {
+                "bucket": bucket.name,
+                "prefix": prefix,
+                "delimiter": delimiter,
+                "max_keys": max_keys,
+                "key_count": len(contents) + len(common_prefixes),
+                "is_truncated": next_cursor is not None,
+                "next_continuation_token": (
+                    encode_token(next_cursor) if next_cursor is not None else None
+                ),
+                "contents": ObjectSerializer(contents, many=True).data,
+                "common_prefixes": common_prefixes,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class BatchObjectsView(BucketObjectsMixin, APIView):
+    """
+    Writes object metadata in bulk: `delete` removes up to 1000 keys in a
+    single DELETE, then `put` upserts up to 1000 objects in a single
+    INSERT ... ON CONFLICT statement. Both are charged to the quota.
+    """
+
+    def post(self, request, org_id, bucket_id):
+        puts = request.data.get("put", [])
+        deletes = request.data.get("delete", [])
+        permission = acl.WRITE | acl.EXECUTE if deletes else acl.WRITE
+        bucket = self.get_bucket(request, org_id, bucket_id, permission)
+
+        if not isinstance(puts, list) or not isinstance(deletes, list):
+            return Response(
+                {"detail": "'put' and 'delete' must be lists."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(puts) > MAX_KEYS or len(deletes) > MAX_KEYS:
+            return Response(
+                {"detail": f"At most {MAX_KEYS} keys per operation."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = ObjectSerializer(data=puts, many=True)
+        serializer.is_valid(raise_exception=True)
+        using = bucket._state.db
+
+        # Deletes go first so the space they free counts towards the puts
+        deleted = 0
+        if deletes:
+            with transaction.atomic(using=using):
+                doomed = bucket.contents.filter(key__in=[str(key) for key in deletes])
+                freed = doomed.aggregate(total=Sum("size"))["total"] or 0
+                deleted, _ = doomed.delete()
+            charge(bucket, -freed)
+
+        # The last entry wins when a key is repeated within one request
+        objects = {
+            item["key"]: Object(bucket=bucket, **item)
+            for item in serializer.validated_data
+        }
+        if objects:
+            replaced = bucket.contents.filter(key__in=objects).aggregate(
+                total=Sum("size")
+            )["total"] or 0
+            delta = sum(obj.size for obj in objects.values()) - replaced
+            charge(bucket, delta)
+            try:
+                Object.objects.using(using).bulk_create(
+                    objects.values(),
+                    update_conflicts=True,
+                    unique_fields=["bucket", "key"],
+                    update_fields=[
+                        "size", "checksum", "content_type", "digest", "updated_at"
+                    ],
+                )
+            except Exception:
+                charge(bucket, -delta)
+                raise
+
+        return Response(
+            {"put": len(objects), "deleted": deleted},
+            status=status.HTTP_200_OK,
+        )
+
+
+class ObjectDataView(BucketObjectsMixin, APIView):
+    """
+    Uploads (PUT), downloads (GET, HEAD) and deletes one object's data.
+    The request body is streamed to the blob store in chunks and never
+    parsed or buffered; downloads honour single-range Range headers.
+    """
+    bucket_permissions = {
+        "GET": acl.READ,
+        "HEAD": acl.READ,
+        "PUT": acl.WRITE,
+        "DELETE": acl.EXECUTE,
+    }
+
+    def get_object(self, bucket, key):
+        try:
+            return bucket.contents.get(key=key)
+        except Object.DoesNotExist:
+            raise NotFound("Object not found.")
+
+    def put(self, request, org_id, bucket_id, key):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+
+        size = self.content_length(request)
+
+        # The body is bounded by Content-Length, so the quota is charged
+        # before anything is written, against the size the key had then.
+        estimate = bucket.contents.filter(key=key).values_list("size", flat=True).first() or 0
+        delta = size - estimate
+        charge(bucket, delta)
+
+        try:
+            digest, written = get_blob_store().write(self.request_chunks(request))
+
+            # The size being replaced is read again under a row lock in
+            # the upsert's transaction, so concurrent writers of one key
+            # each correct the charge against the size they replaced.
+            with transaction.atomic(using=bucket._state.db):
+                previous = (
+                    bucket.contents.select_for_update()
+                    .filter(key=key)
+                    .values_list("size", flat=True)
+                    .first()
+                ) or 0
+                obj, created = bucket.contents.update_or_create(
+                    key=key,
+                    defaults={
+                        "size": written,
+                        "checksum": digest,
+                        "digest": digest,
+                        "content_type": request.content_type or "",
+                    },
+                )
+        except Exception:
+            charge(bucket, -delta)
+            raise
+        # The object is stored by now, so the correction is not refused
+        charge(bucket, written - size - (previous - estimate), enforce=False)
+
+        return Response(
+            ObjectSerializer(obj).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    def get(self, request, org_id, bucket_id, key):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        obj = self.get_object(bucket, key)
+        if not obj.digest:
+            raise NotFound("Object has no data.")
+
+        try:
+            return blob_response(
+                get_blob_store(),
+                obj.digest,
+                obj.size,
+                content_type=obj.content_type,
+                range_header=request.headers.get("Range"),
+                asynchronous=isinstance(request._request, ASGIRequest),
+            )
+        except FileNotFoundError:
+            raise NotFound("Object data is missing.")
+
+    def delete(self, request, org_id, bucket_id, key):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        # The size is read under a row lock and refunded in the delete's
+        # transaction, only if this request removed the row, so concurrent
+        # deletes of one key refund it once. The blob is left for
+        # collect_blobs; other objects may share it.
+        with transaction.atomic(using=bucket._state.db):
+            objects = bucket.contents.filter(key=key)
+            size = objects.select_for_update().values_list("size", flat=True).first()
+            deleted, _ = objects.delete()
+            if not deleted:
+                raise NotFound("Object not found.")
+            charge(bucket, -size)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MultipartUploadMixin(BucketObjectsMixin):
+    bucket_permissions = {
+        "GET": acl.WRITE,
+        "POST": acl.WRITE,
+        "PUT": acl.WRITE,
+        "DELETE": acl.WRITE,
+    }
+
+    def get_upload(self, bucket, upload_id):
+        try:
+            return bucket.uploads.get(pk=upload_id)
+        except MultipartUpload.DoesNotExist:
+            raise NotFound("Upload not found.")
+
+
+class InitiateMultipartUploadView(MultipartUploadMixin, APIView):
+    """
+    Starts a multipart upload of `key`. Parts are then PUT in any order,
+    in parallel, and the upload is completed or aborted.
+    """
+
+    def post(self, request, org_id, bucket_id):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        key = request.data.get("key")
+        if not key:
+            return Response(
+                {"detail": "Object 'key' is required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        upload = bucket.uploads.create(
+            key=key, content_type=request.data.get("content_type", "")
+        )
+        return Response(
+            {"upload_id": upload.pk, "key": upload.key},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class MultipartUploadView(MultipartUploadMixin, APIView):
+    """
+    Lists the parts uploaded so far (GET) or aborts the upload (DELETE).
+    """
+
+    def get(self, request, org_id, bucket_id, upload_id):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        upload = self.get_upload(bucket, upload_id)
+        parts = upload.parts.order_by("part_number").values("part_number", "size", "etag")
+        return Response(
+            {"upload_id": upload.pk, "key": upload.key, "parts": list(parts)},
+            status=status.HTTP_200_OK
+        )
+
+    def delete(self, request, org_id, bucket_id, upload_id):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        try:
+            multipart.abort(self.get_upload(bucket, upload_id))
+        except MultipartUpload.DoesNotExist:
+            raise NotFound("Upload not found.")
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadPartView(MultipartUploadMixin, APIView):
+    """
+    Streams one part to the blob store. Re-uploading a part number
+    replaces it, so a failed part can be retried on its own. Staged parts
+    count against the storage quota.
+    """
+
+    def put(self, request, org_id, bucket_id, upload_id, part_number):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        upload = self.get_upload(bucket, upload_id)
+        if not 1 <= part_number <= multipart.MAX_PART_NUMBER:
+            return Response(
+                {"detail": f"Part number must be between 1 and {multipart.MAX_PART_NUMBER}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        etag, size = multipart.upload_part(
+            bucket,
+            upload,
+            part_number,
+            self.request_chunks(request),
+            self.content_length(request),
+        )
+        return Response(
+            {"part_number": part_number, "size": size, "etag": etag},
+            status=status.HTTP_200_OK
+        )
+
+
+class CompleteMultipartUploadView(MultipartUploadMixin, APIView):
+    """
+    Concatenates the parts into the object. `parts` optionally lists the
+    {"part_number", "etag"} pairs to use, in ascending order.
+    """
+
+    def post(self, request, org_id, bucket_id, upload_id):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        upload = self.get_upload(bucket, upload_id)
+
+        parts = request.data.get("parts")
+        try:
+            if parts is not None:
+                parts = [(int(part["part_number"]), part["etag"]) for part in parts]
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {"detail": "Each part needs a 'part_number' and an 'etag'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            obj = multipart.complete(bucket, upload, parts)
+        except MultipartUpload.DoesNotExist:
+            raise NotFound("Upload not found.")
+        except ValidationError as exc:
+            return Response(
+                {"detail": exc.messages[0]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(ObjectSerializer(obj).data, status=status.HTTP_200_OK)
+
+
+class BucketGrantsView(BucketObjectsMixin, APIView):
+    """
+    Lists (GET) or sets (POST) the per-user and per-group grants of a
+    bucket. Setting a grant replaces the principal's previous one.
+    """
+    permission_classes = [IsAuthenticated, IsOrganizationManager]
+    bucket_permissions = {"GET": acl.ALL, "POST": acl.ALL}
+
+    def get(self, request, org_id, bucket_id):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        grants = bucket.grants.order_by("pk")
+        return Response(
+            BucketGrantSerializer(grants, many=True).data,
+            status=status.HTTP_200_OK
+        )
+
+    def post(self, request, org_id, bucket_id):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        serializer = BucketGrantSerializer(data=request.data, context={"bucket": bucket})
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        grant, created = bucket.grants.update_or_create(
+            user=data.get("user"),
+            group=data.get("group"),
+            defaults={
+                "can_read": data.get("can_read", False),
+                "can_write": data.get("can_write", False),
+                "can_execute": data.get("can_execute", False),
+            },
+        )
+        audit_log.record(
+            "bucket.grant_set",
+            actor=request.user,
+            organization=bucket.organization_id,
+            target=bucket,
+            user=grant.user_id,
+            group=grant.group_id,
+            permissions=acl.grant_bits(grant.can_read, grant.can_write, grant.can_execute),
+        )
+        return Response(
+            BucketGrantSerializer(grant).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class DeleteBucketGrantView(BucketObjectsMixin, APIView):
+    permission_classes = [IsAuthenticated, IsOrganizationManager]
+    bucket_permissions = {"DELETE": acl.ALL}
+
+    def delete(self, request, org_id, bucket_id, grant_id):
+        bucket = self.get_bucket(request, org_id, bucket_id)
+        try:
+            grant = bucket.grants.get(pk=grant_id)
+        except BucketGrant.DoesNotExist:
+            raise NotFound("Grant not found.")
+
+        grant.delete()
+        audit_log.record(
+            "bucket.grant_removed",
+            actor=request.user,
+            organization=bucket.organization_id,
+            target=bucket,
+            user=grant.user_id,
+            group=grant.group_id,
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# --------------------------
+# OPERATIONS VIEWS
+# --------------------------
+
+class ChangesView(APIView):
+    """
+    Change feed for downstream consumers: changes with a sequence number
+    above `?since=`, oldest first, optionally for one `?organization=`.
+    `?wait=<seconds>` long-polls until a change arrives, and
+    "Accept: text/event-stream" streams changes as server-sent events,
+    resuming from Last-Event-ID. Each database has its own sequence,
+    selected with `?shard=`.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+
+    def get(self, request):
+        params = request.query_params
+        using = params.get("shard", DEFAULT_DB_ALIAS)
+        if using not in get_shards():
+            return Response(
+                {"detail": "Unknown shard."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            since = int(request.headers.get("Last-Event-ID") or params.get("since", 0))
+            limit = max(1, min(int(params.get("limit", 100)), 1000))
+            wait = max(0.0, float(params.get("wait", 0)))
+            organization_id = params.get("organization")
+            if organization_id is not None:
+                organization_id = int(organization_id)
+        except ValueError:
+            return Response(
+                {"detail": "'since', 'limit', 'wait' and 'organization' must be numbers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.accepted_renderer.format == "sse":
+            # Django buffers synchronous iterators when serving ASGI
+            asgi = isinstance(request._request, ASGIRequest)
+            stream = changefeed.aevent_stream if asgi else changefeed.event_stream
+            response = StreamingHttpResponse(
+                stream(
+                    using,
+                    since,
+                    lambda event: ChangeEventSerializer(event).data,
+                    organization_id=organization_id,
+                    limit=limit,
+                ),
+                content_type="text/event-stream",
+            )
+            response["Cache-Control"] = "no-cache"
+            return response
+
+        events = changefeed.wait_for_changes(
+            using, since, limit, wait, organization_id=organization_id
+        )
+        return Response(
+            {
+                "changes": ChangeEventSerializer(events, many=True).data,
+                "next": events[-1].pk if events else since,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class BatchView(APIView):
+    """
+    Runs up to 25 sub-requests against this API in one call, in order,
+    as the calling user. With `atomic`, all of them share one transaction
+    and the batch stops and rolls back at the first failure (409).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        atomic = serializer.validated_data["atomic"]
+
+        responses, committed = batch.execute(
+            request,
+            serializer.validated_data["requests"],
+            atomic=atomic,
+            excluded_views={BatchView},
+        )
+        return Response(
+            {"responses": responses, "committed": committed},
+            status=status.HTTP_200_OK if committed else status.HTTP_409_CONFLICT,
+        )
+
+
+class MetricsView(APIView):
+    """
+    Per-process counters for operators.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return Response(
+            {
+                "coalescing": organization_reads.stats(),
+                "push": get_broker().stats(),
+                "databases": breaker_stats(),
+                "requests": requests_in_flight.stats(),
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -13,4 +13,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the app registry is ready
+from accounts.middleware import LoadSheddingApplication  # noqa: E402
+from accounts.push import PushApplication  # noqa: E402
+
+# Serves the organization push channels and hands everything else to
+# Django, shedding load before Django reads the body or starts a thread
+application = PushApplication(LoadSheddingApplication(django_application))
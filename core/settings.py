@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -26,6 +27,81 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 AUTH_USER_MODEL = 'accounts.User'
 
+# Enforce "organization manager must be a member" with a database trigger
+# (installed after migrate) instead of an extra query in Organization.save().
+ACCOUNTS_MANAGER_MEMBERSHIP_TRIGGER = False
+
+# Audit events are buffered and bulk-inserted every AUDIT_LOG_BATCH_SIZE
+# events or AUDIT_LOG_FLUSH_INTERVAL_MS milliseconds.
+AUDIT_LOG_BATCH_SIZE = 100
+AUDIT_LOG_FLUSH_INTERVAL_MS = 500
+
+# Object data is stored by content hash, streamed to and from the backend
+# in ACCOUNTS_UPLOAD_CHUNK_SIZE byte chunks.
+ACCOUNTS_BLOB_STORE = {
+    "BACKEND": "accounts.blobstore.LocalBlobStore",
+    "OPTIONS": {"root": BASE_DIR / "blobs"},
+}
+ACCOUNTS_UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Seconds a verified API key is trusted by a process without checking the
+# database again; also how long a revoked key may keep working elsewhere.
+ACCOUNTS_API_KEY_CACHE_TTL = 60
+
+# Change feed readers re-check the outbox every ACCOUNTS_CHANGES_POLL_INTERVAL
+# seconds for changes made by other processes; an event stream is closed
+# after ACCOUNTS_CHANGES_STREAM_SECONDS and resumed by the client.
+ACCOUNTS_CHANGES_POLL_INTERVAL = 1.0
+ACCOUNTS_CHANGES_STREAM_SECONDS = 300
+# Changes behind a missing sequence number are held back for up to this
+# many seconds, in case it belongs to a transaction still committing.
+ACCOUNTS_CHANGES_GAP_SECONDS = 5
+
+# Push notifications (accounts/push.py): the pub/sub broker, and how many
+# undelivered messages a subscriber may fall behind before it is told to resync.
+ACCOUNTS_PUSH_BROKER = "accounts.pubsub.InProcessBroker"
+ACCOUNTS_PUSH_QUEUE_SIZE = 100
+
+# Responses to requests sent with an Idempotency-Key are replayed for
+# ACCOUNTS_IDEMPOTENCY_KEY_TTL seconds and cached per process for
+# ACCOUNTS_IDEMPOTENCY_CACHE_TTL seconds.
+ACCOUNTS_IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+ACCOUNTS_IDEMPOTENCY_CACHE_TTL = 300
+
+# Responses smaller than this are sent uncompressed
+ACCOUNTS_COMPRESSION_MIN_SIZE = 1024
+
+# Per-process Bloom filter of taken usernames and emails that lets signup
+# skip the availability query for new names, e.g.
+# {"capacity": 1_000_000, "error_rate": 0.01} (about 1.2 MB). None disables it.
+ACCOUNTS_SIGNUP_BLOOM_FILTER = None
+
+# Seconds between loads of newly created users into the username
+# suggestion index (accounts/suggestions.py).
+ACCOUNTS_USERNAME_INDEX_REFRESH = 30
+
+# Audit event ids the rollup job has passed over are re-checked for this
+# many seconds, in case they belonged to a transaction still committing.
+ACCOUNTS_ROLLUP_GAP_SECONDS = 600
+
+# Overload protection (accounts/overload.py): a database alias fails fast
+# with 503 after `failure_threshold` consecutive errors and is probed again
+# after `reset_timeout` seconds; each process admits at most
+# ACCOUNTS_MAX_IN_FLIGHT requests at once (None for no limit). Organization
+# details stay available from the last good copy for
+# ACCOUNTS_STALE_ORGANIZATION_SECONDS while the database is unavailable.
+# The in-flight limit is per process. Under ASGI (core.asgi) Django gives
+# every request its own thread for the synchronous views, and so its own
+# database connection; nothing else bounds how many there are, so keep
+# processes * ACCOUNTS_MAX_IN_FLIGHT under the database's connection limit.
+# 24 lets four processes share PostgreSQL's default max_connections (100,
+# 3 of them reserved for superusers). A threaded WSGI worker never has more
+# requests in flight than it has threads, so there the limit has to be set
+# below the thread count to shed anything.
+ACCOUNTS_DB_CIRCUIT_BREAKER = {"failure_threshold": 5, "reset_timeout": 10}
+ACCOUNTS_MAX_IN_FLIGHT = 24
+ACCOUNTS_STALE_ORGANIZATION_SECONDS = 300
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -53,6 +129,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "accounts.middleware.LoadSheddingMiddleware",
+    "accounts.middleware.CompressionMiddleware",
+    "accounts.middleware.DatabaseCircuitMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -81,7 +160,20 @@ TEMPLATES = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedUserJWTAuthentication",
+        "accounts.authentication.ApiKeyAuthentication",
+    ),
+    # MessagePack is offered alongside JSON for internal services
+    "DEFAULT_RENDERER_CLASSES": (
+        "rest_framework.renderers.JSONRenderer",
+        "accounts.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "rest_framework.parsers.JSONParser",
+        "accounts.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
 }
 
@@ -99,6 +191,21 @@ DATABASES = {
     }
 }
 
+# Tenant data (buckets) is sharded by organization. "default" is shard 0;
+# ACCOUNTS_SHARD_COUNT=N adds local SQLite shards shard_1 .. shard_{N-1}
+# for development. Production deployments list their own aliases here.
+ACCOUNTS_SHARD_COUNT = int(os.environ.get("ACCOUNTS_SHARD_COUNT", "1"))
+
+for index in range(1, ACCOUNTS_SHARD_COUNT):
+    DATABASES[f"shard_{index}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"db_shard_{index}.sqlite3",
+    }
+
+ACCOUNTS_SHARDS = list(DATABASES)
+
+DATABASE_ROUTERS = ["accounts.routers.TenantShardRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
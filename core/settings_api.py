@@ -0,0 +1,52 @@
+"""
+API-only settings profile for workers serving the JSON API under
+accounts/.
+
+    DJANGO_SETTINGS_MODULE=core.settings_api
+
+The API authenticates with JWT only, so admin, sessions, messages,
+staticfiles and the CSRF/clickjacking/session/auth middleware are dropped
+from the request path. The admin keeps running on its own mount, served by
+a separate deployment using core.settings.
+
+Compare boot time and per-request overhead with:
+
+    python manage.py startup_profile --settings core.settings_api --requests 500
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "accounts",
+]
+
+# Built from the full profile so the accounts middleware (load shedding,
+# compression, the database circuit breaker) stays in the same order
+MIDDLEWARE = [
+    name
+    for name in MIDDLEWARE  # noqa: F405
+    if name
+    not in {
+        "django.contrib.sessions.middleware.SessionMiddleware",
+        "django.middleware.csrf.CsrfViewMiddleware",
+        "django.contrib.auth.middleware.AuthenticationMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+        "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    }
+]
+
+ROOT_URLCONF = "core.urls_api"
+
+TEMPLATES = []
+
+# JSON and MessagePack, without the browsable API
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa: F405
+    "DEFAULT_RENDERER_CLASSES": tuple(
+        name
+        for name in REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"]  # noqa: F405
+        if name != "rest_framework.renderers.BrowsableAPIRenderer"
+    ),
+}
@@ -0,0 +1,23 @@
+"""
+Settings for the test suite, selected automatically by `manage.py test`.
+
+    python manage.py test --parallel
+
+Databases are in-memory SQLite, the accounts schema is created straight
+from the models instead of replaying migration history, and passwords use
+a fast hasher.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+for alias, database in DATABASES.items():  # noqa: F405
+    database["NAME"] = ":memory:"
+    database["TEST"] = {"NAME": None}
+
+MIGRATION_MODULES = {"accounts": None}
+
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+# Write audit events synchronously so tests see them and nothing is left
+# buffered once the test databases are gone.
+AUDIT_LOG_BATCH_SIZE = 1
@@ -0,0 +1,10 @@
+"""
+URL configuration for API-only workers (core.settings_api). The admin is
+mounted by the full configuration in core.urls.
+"""
+
+from django.urls import path, include
+
+urlpatterns = [
+    path("accounts/", include("accounts.urls")),
+]
@@ -16,6 +16,7 @@ django.setup()
 
 import random
 from django.contrib.auth import get_user_model
+from accounts.suggestions import suggest
 
 User = get_user_model()
 
@@ -30,7 +31,8 @@ def create_users(n):
         first_name = random.choice(first_names)
         last_name = random.choice(last_names)
         
-        username = f"{first_name.lower()}.{last_name.lower()}"
+        # first.last, or the first free variant of it
+        username = suggest(first_name=first_name, last_name=last_name, count=1)[0]
         email = f"{username}@example.com"
         
         name = f"{first_name} {last_name}"